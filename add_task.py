@@ -1,35 +1,54 @@
+import argparse
 import json
+import os
 import sys
 from pathlib import Path
 
-def get_input(prompt, default=None):
-    """Get user input with optional default"""
-    if default:
-        user_input = input(f"{prompt} [{default}]: ").strip()
-        return user_input if user_input else default
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def get_input_required(prompt):
+    """Get user input with no default"""
     return input(f"{prompt}: ").strip()
 
+def get_input_default(prompt, default):
+    """Get user input, falling back to default on an empty answer"""
+    user_input = input(f"{prompt} [{default}]: ").strip()
+    return user_input if user_input else default
+
 def get_multiline_input(prompt):
-    """Get multiline input (end with empty line)"""
+    """
+    Get multiline input (end with empty line or EOF)
+    
+    Reads straight from the buffered sys.stdin instead of input(), so a
+    pasted reference solution is consumed in bulk rather than line by line
+    through the interactive line editor.
+    """
     print(f"{prompt}")
-    print("(Enter your code, then press Enter twice to finish)")
+    print("(Enter your code, then press Enter twice or Ctrl-D to finish)")
+    sys.stdout.flush()
     lines = []
-    while True:
-        line = input()
+    for line in iter(sys.stdin.readline, ''):
+        line = line.rstrip('\r\n')
         if line == "" and lines and lines[-1] == "":
             break
         lines.append(line)
-    return "\n".join(lines[:-1])  # Remove last empty line
+    # Drop trailing empty lines left by the terminator
+    while lines and lines[-1] == "":
+        lines.pop()
+    return "\n".join(lines)
 
 def create_task():
     
     # Get task ID
-    task_id = get_input("Task ID (e.g., basic_004)")
+    task_id = get_input_required("Task ID (e.g., basic_004)")
     while not task_id:
         print("Task ID is required!")
-        task_id = get_input("Task ID (e.g., basic_004)")
+        task_id = get_input_required("Task ID (e.g., basic_004)")
     
-    category_choice = get_input("Choose category (1-4)")
+    category_choice = get_input_required("Choose category (1-4)")
     categories = {
         '1': 'basic_syntax',
         '2': 'reference_capabilities',
@@ -38,7 +57,7 @@ def create_task():
     }
     category = categories.get(category_choice, 'basic_syntax')
     
-    diff_choice = get_input("Choose difficulty (1-4)")
+    diff_choice = get_input_required("Choose difficulty (1-4)")
     difficulties = {
         '1': 'easy',
         '2': 'medium',
@@ -48,9 +67,9 @@ def create_task():
     difficulty = difficulties.get(diff_choice, 'medium')
     
     # Get task details
-    title = get_input("Task title (e.g., 'Array Reversal')")
-    description = get_input("Task description (brief)")
-    prompt = get_input("Task prompt for LLM")
+    title = get_input_required("Task title (e.g., 'Array Reversal')")
+    description = get_input_required("Task description (brief)")
+    prompt = get_input_required("Task prompt for LLM")
     
     # Get reference solution
     print("\nReference solution:")
@@ -59,21 +78,21 @@ def create_task():
     # Get test cases
     print("\nTest cases (optional, press Enter to skip)")
     test_cases = []
-    add_tests = get_input("Add test cases? (y/n)", "n")
+    add_tests = get_input_default("Add test cases? (y/n)", "n")
     
     if add_tests.lower() == 'y':
         while True:
-            test_input = get_input("Test input (or 'done')")
+            test_input = get_input_required("Test input (or 'done')")
             if test_input.lower() == 'done':
                 break
-            test_expected = get_input("Expected output")
+            test_expected = get_input_required("Expected output")
             test_cases.append({
                 "input": test_input,
                 "expected": test_expected
             })
     
     # Get tags
-    tags_input = get_input("Tags (comma-separated, e.g., 'recursion,arrays')", "")
+    tags_input = get_input_required("Tags (comma-separated, e.g., 'recursion,arrays')")
     tags = [tag.strip() for tag in tags_input.split(',') if tag.strip()]
     
     # Create task object
@@ -91,37 +110,95 @@ def create_task():
     
     return task
 
-def add_task_to_dataset(task, dataset_path):
-    """Add task to existing dataset"""
+def load_dataset(dataset_path):
+    """Load the dataset once so a session can add several tasks in memory"""
+    if orjson is not None:
+        with open(dataset_path, 'rb') as f:
+            return orjson.loads(f.read())
     with open(dataset_path, 'r') as f:
-        dataset = json.load(f)
+        return json.load(f)
+
+def save_dataset(dataset, dataset_path):
+    """
+    Write the in-memory dataset back to disk (orjson when available)
     
+    Writes to a temp file next to the dataset and renames it over the
+    original, so a crash mid-write never leaves a truncated pony_tasks.json.
+    """
+    if orjson is not None:
+        data = orjson.dumps(dataset, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(dataset, indent=2).encode('utf-8')
+    
+    tmp_path = dataset_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, dataset_path)
+
+def add_task_to_dataset(task, dataset, tasks_by_id):
+    """Add task to the in-memory task index (saved by the caller)"""
     # Check for duplicate ID
-    existing_ids = [t['id'] for t in dataset['tasks']]
-    if task['id'] in existing_ids:
+    if task['id'] in tasks_by_id:
         print(f"\n⚠️  Warning: Task ID '{task['id']}' already exists!")
-        overwrite = get_input("Overwrite existing task? (y/n)", "n")
+        overwrite = get_input_default("Overwrite existing task? (y/n)", "n")
         if overwrite.lower() != 'y':
             print("Aborting.")
             return False
-        # Remove old task
-        dataset['tasks'] = [t for t in dataset['tasks'] if t['id'] != task['id']]
     
-    # Add new task
-    dataset['tasks'].append(task)
+    # Add new task (replaces the old one in place on overwrite)
+    tasks_by_id[task['id']] = task
     
     # Update metadata
-    dataset['metadata']['total_tasks'] = len(dataset['tasks'])
-    
-    # Save
-    with open(dataset_path, 'w') as f:
-        json.dump(dataset, f, indent=2)
+    dataset['metadata']['total_tasks'] = len(tasks_by_id)
     
     print(f"\n✅ Task '{task['id']}' added to dataset!")
     print(f"Total tasks: {dataset['metadata']['total_tasks']}")
     
     return True
 
+REQUIRED_FIELDS = (
+    'id', 'category', 'difficulty', 'title',
+    'description', 'prompt', 'reference_solution'
+)
+
+def load_task_file(path):
+    """Load a list of tasks (or a {"tasks": [...]} dataset) from a JSON file, '-' for stdin"""
+    if path == '-':
+        data = json.load(sys.stdin)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('tasks', [])
+    return data
+
+def validate_task(task):
+    """Return a list of problems with a task dict (empty if valid)"""
+    if not isinstance(task, dict):
+        return ["task is not a JSON object"]
+    return [f"missing field '{field}'" for field in REQUIRED_FIELDS if field not in task]
+
+def add_tasks_batch(tasks, dataset, tasks_by_id, overwrite=False):
+    """Validate and add many tasks to the in-memory index, returning the number added"""
+    added = 0
+    for index, task in enumerate(tasks):
+        problems = validate_task(task)
+        if problems:
+            print(f"Skipping task #{index}: {', '.join(problems)}")
+            continue
+        if task['id'] in tasks_by_id and not overwrite:
+            print(f"Skipping task '{task['id']}': ID already exists (use --overwrite)")
+            continue
+        task.setdefault('test_cases', [])
+        task.setdefault('tags', [])
+        tasks_by_id[task['id']] = task
+        added += 1
+    
+    dataset['metadata']['total_tasks'] = len(tasks_by_id)
+    return added
+
 def preview_task(task):
     """Preview the created task"""
     print("\n" + "="*60)
@@ -141,26 +218,56 @@ def preview_task(task):
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Add tasks to the Pony task dataset")
+    parser.add_argument(
+        '--from-file', metavar='TASKS_JSON',
+        help="Add tasks from a JSON list ('-' reads stdin) instead of prompting"
+    )
+    parser.add_argument(
+        '--overwrite', action='store_true',
+        help="With --from-file, replace tasks whose ID already exists"
+    )
+    args = parser.parse_args()
+    
     dataset_path = Path(__file__).parent / 'dataset' / 'pony_tasks.json'
     
     if not dataset_path.exists():
         print(f"Error: Dataset not found at {dataset_path}")
         sys.exit(1)
     
-    while True:
-        task = create_task()
-        preview_task(task)
-        
-        confirm = get_input("Add this task to dataset? (y/n)", "y")
-        if confirm.lower() == 'y':
-            if add_task_to_dataset(task, dataset_path):
-                print("\nSuccess")
-            else:
-                print("\nFailed to add task")
-        
-        another = get_input("\nCreate another task? (y/n)", "n")
-        if another.lower() != 'y':
-            break
+    dataset = load_dataset(dataset_path)
+    tasks_by_id = {t['id']: t for t in dataset['tasks']}
+    modified = False
+    
+    try:
+        if args.from_file:
+            added = add_tasks_batch(
+                load_task_file(args.from_file), dataset, tasks_by_id, args.overwrite
+            )
+            print(f"Added {added} task(s)")
+            modified = added > 0
+        else:
+            while True:
+                task = create_task()
+                preview_task(task)
+                
+                confirm = get_input_default("Add this task to dataset? (y/n)", "y")
+                if confirm.lower() == 'y':
+                    if add_task_to_dataset(task, dataset, tasks_by_id):
+                        modified = True
+                        print("\nSuccess")
+                    else:
+                        print("\nFailed to add task")
+                
+                another = get_input_default("\nCreate another task? (y/n)", "n")
+                if another.lower() != 'y':
+                    break
+    finally:
+        # Save once at the end of the session (also on Ctrl-C)
+        if modified:
+            dataset['tasks'] = list(tasks_by_id.values())
+            save_dataset(dataset, dataset_path)
+            print(f"Saved {dataset['metadata']['total_tasks']} tasks to {dataset_path}")
     
     print("\nDone")
 
@@ -0,0 +1,3 @@
+"""
+Evaluation harness, analysis and utilities for Pony LLM code synthesis
+"""
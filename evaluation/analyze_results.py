@@ -4,32 +4,79 @@ Analysis and Visualization Script for Pony LLM Evaluation Results
 """
 
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
 from pathlib import Path
-import numpy as np
-from typing import List, Dict 
+from typing import Iterable
 
-def analyze_retries(results: List[dict]) -> dict:
-    """Analyze retry patterns and statistics"""
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Heavy plotting/data libraries are imported on first use by
+# _import_analysis_libs() so bad invocations exit without paying for them
+pd = None
+plt = None
+sns = None
+np = None
+
+DIFFICULTY_ORDER = ['easy', 'medium', 'hard', 'expert']
+# Bar color per difficulty level, filled in once by _import_analysis_libs()
+DIFFICULTY_COLORS = {}
+
+def _import_analysis_libs():
+    """Import pandas/matplotlib/seaborn/numpy into module globals"""
+    global pd, plt, sns, np
+    if pd is not None:
+        return
+    import pandas
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    import seaborn
+    import numpy
+    pd, plt, sns, np = pandas, matplotlib.pyplot, seaborn, numpy
+    colors = plt.cm.RdYlGn_r(np.linspace(0.2, 0.8, len(DIFFICULTY_ORDER)))
+    DIFFICULTY_COLORS.update(zip(DIFFICULTY_ORDER, colors))
+    sns.set_theme(style="whitegrid")
+    plt.rcParams['figure.figsize'] = (12, 8)
+
+# Per-process analyzer copy used by generate_all_analyses() workers
+_worker_analyzer = None
+
+def _init_analysis_worker(analyzer):
+    """Process pool initializer: receive the analyzer once per worker"""
+    global _worker_analyzer
+    _import_analysis_libs()
+    _worker_analyzer = analyzer
+
+def _run_analysis(method_name: str):
+    """Run one ResultAnalyzer report in a worker process"""
+    getattr(_worker_analyzer, method_name)()
+
+def analyze_retries(results: Iterable[dict]) -> dict:
+    """Analyze retry patterns and statistics (accepts any iterable of records)"""
     retry_stats = {
-        'total_tasks': len(results),
+        'total_tasks': 0,
         'succeeded_on_first_try': 0,
         'succeeded_on_retry': 0,
         'never_succeeded': 0,
-        'retry_attempts': [],
+        'total_retries': 0,
+        'max_retries_needed': 0,
         'by_strategy': {}
     }
     
     for r in results:
+        retry_stats['total_tasks'] += 1
         strategy = r['strategy']
         if strategy not in retry_stats['by_strategy']:
             retry_stats['by_strategy'][strategy] = {
                 'first_try': 0,
                 'retry_success': 0,
                 'failed': 0,
-                'retry_counts': []
+                'total_retries': 0
             }
         
         if r['compilation_success']:
@@ -39,20 +86,20 @@ def analyze_retries(results: List[dict]) -> dict:
                 retry_stats['by_strategy'][strategy]['first_try'] += 1
             else:
                 retry_stats['succeeded_on_retry'] += 1
-                retry_stats['retry_attempts'].append(retry_count)
+                retry_stats['total_retries'] += retry_count
+                if retry_count > retry_stats['max_retries_needed']:
+                    retry_stats['max_retries_needed'] = retry_count
                 retry_stats['by_strategy'][strategy]['retry_success'] += 1
-                retry_stats['by_strategy'][strategy]['retry_counts'].append(retry_count)
+                retry_stats['by_strategy'][strategy]['total_retries'] += retry_count
         else:
             retry_stats['never_succeeded'] += 1
             retry_stats['by_strategy'][strategy]['failed'] += 1
     
-    # Calculate averages
-    if retry_stats['retry_attempts']:
-        retry_stats['mean_retries_when_needed'] = sum(retry_stats['retry_attempts']) / len(retry_stats['retry_attempts'])
-        retry_stats['max_retries_needed'] = max(retry_stats['retry_attempts'])
+    # Calculate averages from the running totals
+    if retry_stats['succeeded_on_retry']:
+        retry_stats['mean_retries_when_needed'] = retry_stats['total_retries'] / retry_stats['succeeded_on_retry']
     else:
         retry_stats['mean_retries_when_needed'] = 0
-        retry_stats['max_retries_needed'] = 0
     
     # Calculate improvement from retries
     if retry_stats['total_tasks'] > 0:
@@ -65,39 +112,144 @@ def analyze_retries(results: List[dict]) -> dict:
 
 
 class ResultAnalyzer:
-    def __init__(self, results_file: Path, output_dir: Path):
+    def __init__(self, results_file: Path, output_dir: Path, dpi: int = 150, fmt: str = 'png'):
+        _import_analysis_libs()
         self.results_file = results_file
         self.output_dir = output_dir
+        # 150 DPI keeps PNG encoding cheap; fmt='svg' skips rasterizing entirely
+        self.dpi = dpi
+        self.fmt = fmt
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        # Explicit compact dtypes in one astype: low-cardinality labels become
+        # categoricals (groupbys hash int codes, not strings)
+        dtypes = {
+            'strategy': 'category',
+            'category': 'category',
+            'task_id': 'category',
+            'compilation_success': 'bool',
+            'execution_time': 'float32',
+            'retry_count': 'Int16',
+            'compilation_error': 'string',
+        }
+        self.df = self._load_results(results_file)
+        if 'difficulty' in self.df.columns:
+            # Known levels first so groupbys come out easy -> expert; labels
+            # outside DIFFICULTY_ORDER are kept (after them), not turned into NaN
+            observed = self.df['difficulty'].dropna().unique()
+            extra = sorted((d for d in observed if d not in DIFFICULTY_ORDER), key=str)
+            dtypes['difficulty'] = pd.CategoricalDtype(DIFFICULTY_ORDER + extra)
+        self.df = self.df.astype(
+            {col: dtype for col, dtype in dtypes.items() if col in self.df.columns}
+        )
+        # One fused pass over the results; per-dimension stats are derived from it.
+        # dropna=False keeps rows with a missing label in the other dimensions' totals
+        self._success_dims = [
+            col for col in ('strategy', 'category', 'difficulty') if col in self.df.columns
+        ]
+        self._success_agg = self.df.groupby(
+            self._success_dims, observed=True, dropna=False
+        )['compilation_success'].agg(['sum', 'count'])
+        self._stats_cache = {}
+        # Shared figure reused by every plot instead of a fresh one per chart,
+        # created on first use (and never pickled into worker processes)
+        self.fig = None
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['fig'] = None
+        return state
+    
+    def close(self):
+        """Release the shared figure"""
+        if self.fig is not None:
+            plt.close(self.fig)
+            self.fig = None
+    
+    @staticmethod
+    def _load_results(results_file: Path) -> 'pd.DataFrame':
+        """
+        Load the results JSON array into a DataFrame
+        
+        With ijson installed the records are streamed straight into pandas, so
+        the full list of result dicts is never held next to the DataFrame.
+        """
+        if ijson is not None:
+            with open(results_file, 'rb') as f:
+                return pd.DataFrame.from_records(ijson.items(f, 'item', use_float=True))
         with open(results_file, 'r') as f:
-            self.results = json.load(f)
+            return pd.DataFrame.from_records(json.load(f))
+    
+    def _success_stats(self, levels) -> 'pd.DataFrame':
+        """
+        Success rate/attempts/successes per `levels`, rolled up from the fused groupby
         
-        self.df = pd.DataFrame(self.results)
-        sns.set_theme(style="whitegrid")
-        plt.rcParams['figure.figsize'] = (12, 8)
+        Results are cached per `levels`; callers must not modify them in place.
+        """
+        key = tuple(levels) if isinstance(levels, list) else levels
+        if key in self._stats_cache:
+            return self._stats_cache[key]
+        stats = self._success_agg.groupby(level=levels, observed=True)[['sum', 'count']].sum()
+        stats['mean'] = stats['sum'] / stats['count']
+        stats = stats[['mean', 'count', 'sum']]
+        stats.columns = ['success_rate', 'total_attempts', 'successful']
+        self._stats_cache[key] = stats
+        return stats
+    
+    def _new_axes(self, figsize):
+        """Clear the shared figure, resize it and return a fresh Axes"""
+        if self.fig is None:
+            self.fig = plt.figure(constrained_layout=True)
+        self.fig.clear()
+        self.fig.set_size_inches(*figsize)
+        return self.fig.add_subplot()
+    
+    def _save_figure(self, name: str):
+        """Save the shared figure as <name>.<fmt> in the output directory"""
+        self.fig.savefig(self.output_dir / f'{name}.{self.fmt}', dpi=self.dpi)
     
-    def generate_all_analyses(self):
+    ANALYSES = (
+        'success_rate_by_strategy',
+        'success_rate_by_category',
+        'success_rate_by_difficulty',
+        'strategy_category_heatmap',
+        'execution_time_analysis',
+        'error_analysis',
+        'retry_analysis',
+        'comparative_analysis',
+    )
+    
+    def generate_all_analyses(self, workers: int = None):
+        """
+        Run every report. They are independent, so by default they run in a
+        process pool (one worker per core); workers=1 runs them serially.
+        """
         print("Generating analysis reports...")
-        self.success_rate_by_strategy()
-        self.success_rate_by_category()
-        self.success_rate_by_difficulty()
-        self.strategy_category_heatmap()
-        self.execution_time_analysis()
-        self.error_analysis()
-        self.retry_analysis()
-        self.comparative_analysis()
+        if workers is None:
+            workers = min(len(self.ANALYSES), os.cpu_count() or 1)
+        
+        if workers <= 1:
+            for name in self.ANALYSES:
+                getattr(self, name)()
+            self.close()
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_analysis_worker,
+                initargs=(self,)
+            ) as executor:
+                futures = [executor.submit(_run_analysis, name) for name in self.ANALYSES]
+                wait(futures)
+                for future in futures:
+                    future.result()  # re-raise worker errors
         print(f"\n✓ All analyses saved to {self.output_dir}")
     
     def success_rate_by_strategy(self):
-        strategy_stats = self.df.groupby('strategy').agg({
-            'compilation_success': ['mean', 'count', 'sum']
-        }).round(3)
-        strategy_stats.columns = ['success_rate', 'total_attempts', 'successful']
+        strategy_stats = self._success_stats('strategy')
         strategy_stats = strategy_stats.sort_values('success_rate', ascending=False)
-        strategy_stats.to_csv(self.output_dir / 'strategy_success_rates.csv')
+        strategy_stats.to_csv(self.output_dir / 'strategy_success_rates.csv', float_format='%.3f', lineterminator='\n')
         
-        fig, ax = plt.subplots(figsize=(12, 6))
+        ax = self._new_axes((12, 6))
         strategies = strategy_stats.index
         success_rates = strategy_stats['success_rate'] * 100
         bars = ax.bar(range(len(strategies)), success_rates, color='steelblue')
@@ -113,20 +265,15 @@ class ResultAnalyzer:
             ax.text(bar.get_x() + bar.get_width()/2., height,
                    f'{height:.1f}%', ha='center', va='bottom', fontsize=10)
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'strategy_success_rates.png', dpi=300)
-        plt.close()
+        self._save_figure('strategy_success_rates')
         print(f"✓ Strategy analysis saved")
     
     def success_rate_by_category(self):
-        category_stats = self.df.groupby('category').agg({
-            'compilation_success': ['mean', 'count', 'sum']
-        }).round(3)
-        category_stats.columns = ['success_rate', 'total_attempts', 'successful']
+        category_stats = self._success_stats('category')
         category_stats = category_stats.sort_values('success_rate', ascending=False)
-        category_stats.to_csv(self.output_dir / 'category_success_rates.csv')
+        category_stats.to_csv(self.output_dir / 'category_success_rates.csv', float_format='%.3f', lineterminator='\n')
         
-        fig, ax = plt.subplots(figsize=(10, 6))
+        ax = self._new_axes((10, 6))
         categories = category_stats.index
         success_rates = category_stats['success_rate'] * 100
         bars = ax.bar(range(len(categories)), success_rates, color='coral')
@@ -142,26 +289,21 @@ class ResultAnalyzer:
             ax.text(bar.get_x() + bar.get_width()/2., height,
                    f'{height:.1f}%', ha='center', va='bottom', fontsize=10)
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'category_success_rates.png', dpi=300)
-        plt.close()
+        self._save_figure('category_success_rates')
         print(f"✓ Category analysis saved")
     
     def success_rate_by_difficulty(self):
-        difficulty_stats = self.df.groupby('difficulty').agg({
-            'compilation_success': ['mean', 'count', 'sum']
-        }).round(3)
-        difficulty_stats.columns = ['success_rate', 'total_attempts', 'successful']
-        difficulty_order = ['easy', 'medium', 'hard', 'expert']
-        difficulty_stats = difficulty_stats.reindex(
-            [d for d in difficulty_order if d in difficulty_stats.index]
-        )
-        difficulty_stats.to_csv(self.output_dir / 'difficulty_success_rates.csv')
+        if 'difficulty' not in self._success_dims:
+            print("No difficulty column in results, skipping difficulty analysis")
+            return
+        # Category order: rows already come out easy -> expert, then other labels
+        difficulty_stats = self._success_stats('difficulty')
+        difficulty_stats.to_csv(self.output_dir / 'difficulty_success_rates.csv', float_format='%.3f', lineterminator='\n')
         
-        fig, ax = plt.subplots(figsize=(10, 6))
+        ax = self._new_axes((10, 6))
         difficulties = difficulty_stats.index
         success_rates = difficulty_stats['success_rate'] * 100
-        colors = plt.cm.RdYlGn_r(np.linspace(0.2, 0.8, len(difficulties)))
+        colors = [DIFFICULTY_COLORS.get(d, 'gray') for d in difficulties]
         bars = ax.bar(range(len(difficulties)), success_rates, color=colors)
         ax.set_xlabel('Difficulty Level', fontsize=12)
         ax.set_ylabel('Success Rate (%)', fontsize=12)
@@ -175,35 +317,26 @@ class ResultAnalyzer:
             ax.text(bar.get_x() + bar.get_width()/2., height,
                    f'{height:.1f}%', ha='center', va='bottom', fontsize=10)
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'difficulty_success_rates.png', dpi=300)
-        plt.close()
+        self._save_figure('difficulty_success_rates')
         print(f"✓ Difficulty analysis saved")
     
     def strategy_category_heatmap(self):
-        pivot = self.df.pivot_table(
-            values='compilation_success',
-            index='strategy',
-            columns='category',
-            aggfunc='mean'
-        )
+        pivot = self._success_stats(['strategy', 'category'])['success_rate'].unstack('category')
         
-        fig, ax = plt.subplots(figsize=(12, 8))
+        ax = self._new_axes((12, 8))
         sns.heatmap(pivot * 100, annot=True, fmt='.1f', cmap='YlGnBu',
                    cbar_kws={'label': 'Success Rate (%)'}, ax=ax)
         ax.set_title('Success Rate Heatmap: Strategy vs Category', fontsize=14, fontweight='bold')
         ax.set_xlabel('Task Category', fontsize=12)
         ax.set_ylabel('Prompting Strategy', fontsize=12)
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'strategy_category_heatmap.png', dpi=300)
-        plt.close()
+        self._save_figure('strategy_category_heatmap')
         print(f"✓ Heatmap saved")
     
     def execution_time_analysis(self):
-        time_stats = self.df.groupby('strategy')['execution_time'].agg(['mean', 'median', 'std']).round(2)
-        time_stats.to_csv(self.output_dir / 'execution_times.csv')
+        time_stats = self.df.groupby('strategy', observed=True)['execution_time'].agg(['mean', 'median', 'std'])
+        time_stats.to_csv(self.output_dir / 'execution_times.csv', float_format='%.2f', lineterminator='\n')
         
-        fig, ax = plt.subplots(figsize=(12, 6))
+        ax = self._new_axes((12, 6))
         strategies = time_stats.index
         mean_times = time_stats['mean']
         bars = ax.bar(range(len(strategies)), mean_times, color='mediumpurple')
@@ -218,13 +351,11 @@ class ResultAnalyzer:
             ax.text(bar.get_x() + bar.get_width()/2., height,
                    f'{height:.1f}s', ha='center', va='bottom', fontsize=9)
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / 'execution_times.png', dpi=300)
-        plt.close()
+        self._save_figure('execution_times')
         print(f"✓ Execution time analysis saved")
     
     def error_analysis(self):
-        failed = self.df[self.df['compilation_success'] == False]
+        failed = self.df.loc[~self.df['compilation_success'].astype(bool)]
         if len(failed) == 0:
             print("✓ No compilation errors to analyze")
             return
@@ -233,21 +364,25 @@ class ResultAnalyzer:
             f.write("COMPILATION ERROR ANALYSIS\n" + "=" * 60 + "\n\n")
             f.write(f"Total Failed Compilations: {len(failed)}\n\n")
             f.write("Errors by Strategy:\n")
-            for strategy, count in failed.groupby('strategy').size().sort_values(ascending=False).items():
+            for strategy, count in failed.groupby('strategy', observed=True).size().sort_values(ascending=False).items():
                 f.write(f"  {strategy}: {count}\n")
             f.write("\n" + "=" * 60 + "\n\n")
             f.write("Sample Compilation Errors:\n\n")
-            for idx, row in failed.head(10).iterrows():
-                f.write(f"Task: {row['task_id']} | Strategy: {row['strategy']}\n")
-                if row['compilation_error']:
-                    f.write(f"Error: {row['compilation_error'][:200]}...\n")
+            sample = failed[['task_id', 'strategy', 'compilation_error']].head(10)
+            for row in sample.itertuples(index=False):
+                f.write(f"Task: {row.task_id} | Strategy: {row.strategy}\n")
+                if pd.notna(row.compilation_error) and row.compilation_error:
+                    f.write(f"Error: {row.compilation_error[:200]}...\n")
                 f.write("-" * 60 + "\n\n")
         print(f"✓ Error analysis saved")
 
 
     def retry_analysis(self):
         """Analyze and visualize retry statistics"""
-        retry_stats = analyze_retries(self.results)
+        records = self.df[['strategy', 'compilation_success']].assign(
+            retry_count=self.df['retry_count'].fillna(0) if 'retry_count' in self.df else 0
+        )
+        retry_stats = analyze_retries(row._asdict() for row in records.itertuples(index=False))
     
     # Save text report
         with open(self.output_dir / 'retry_analysis.txt', 'w') as f:
@@ -259,7 +394,7 @@ class ResultAnalyzer:
             f.write(f"Final Success Rate: {retry_stats.get('final_success_rate', 0):.1f}%\n")
             f.write(f"Improvement from Retries: +{retry_stats.get('improvement_from_retries', 0):.1f}%\n\n")
         
-            if retry_stats['retry_attempts']:
+            if retry_stats['succeeded_on_retry']:
                 f.write(f"Mean Retries (when needed): {retry_stats['mean_retries_when_needed']:.2f}\n")
                 f.write(f"Max Retries Needed: {retry_stats['max_retries_needed']}\n\n")
         
@@ -272,8 +407,8 @@ class ResultAnalyzer:
                 f.write(f"  First Try Success: {stats['first_try']}/{total}\n")
                 f.write(f"  Retry Success: {stats['retry_success']}/{total}\n")
                 f.write(f"  Failed: {stats['failed']}/{total}\n")
-                if stats['retry_counts']:
-                    f.write(f"  Avg Retries Needed: {sum(stats['retry_counts'])/len(stats['retry_counts']):.2f}\n")
+                if stats['retry_success']:
+                    f.write(f"  Avg Retries Needed: {stats['total_retries']/stats['retry_success']:.2f}\n")
                 f.write("\n")
     
         print(f"✓ Retry analysis saved") 
@@ -286,26 +421,30 @@ class ResultAnalyzer:
             f.write(f"Total Evaluations: {total}\n")
             f.write(f"Overall Success Rate: {successful/total*100:.1f}%\n\n")
             
-            best_strategy = self.df.groupby('strategy')['compilation_success'].mean().idxmax()
-            best_rate = self.df.groupby('strategy')['compilation_success'].mean().max()
+            strategy_rates = self._success_stats('strategy')['success_rate']
+            best_strategy = strategy_rates.idxmax()
+            best_rate = strategy_rates.max()
             f.write(f"Best Strategy: {best_strategy} ({best_rate*100:.1f}%)\n")
             
-            best_category = self.df.groupby('category')['compilation_success'].mean().idxmax()
-            best_cat_rate = self.df.groupby('category')['compilation_success'].mean().max()
+            category_rates = self._success_stats('category')['success_rate']
+            best_category = category_rates.idxmax()
+            best_cat_rate = category_rates.max()
             f.write(f"Easiest Category: {best_category} ({best_cat_rate*100:.1f}%)\n\n")
             
-            worst_category = self.df.groupby('category')['compilation_success'].mean().idxmin()
-            worst_cat_rate = self.df.groupby('category')['compilation_success'].mean().min()
+            worst_category = category_rates.idxmin()
+            worst_cat_rate = category_rates.min()
             f.write(f"Hardest Category: {worst_category} ({worst_cat_rate*100:.1f}%)\n")
         print(f"✓ Comparative summary saved")
 
 def main():
-    import sys
     if len(sys.argv) < 2:
         print("Usage: python analyze_results.py <results_file.json>")
         sys.exit(1)
     
     results_file = Path(sys.argv[1])
+    if not results_file.exists():
+        print(f"Error: Results file not found: {results_file}")
+        sys.exit(1)
     output_dir = results_file.parent / 'analysis'
     analyzer = ResultAnalyzer(results_file, output_dir)
     analyzer.generate_all_analyses()
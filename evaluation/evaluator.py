@@ -1,8 +1,18 @@
+import argparse
+import atexit
+import functools
+import hashlib
+import itertools
 import json
 import os
 import subprocess
+import tempfile
 import sys
+import threading
 import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
@@ -10,9 +20,31 @@ import re
 import time
 from datetime import datetime
 
-# Add prompts directory to path
-sys.path.append(str(Path(__file__).parent.parent / 'prompts'))
-from prompting_strategies import get_prompt
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dump_json_bytes(obj) -> bytes:
+    """Compact JSON encoding (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode('utf-8')
+
+@functools.lru_cache(maxsize=None)
+def _read_dataset(dataset_path: Path) -> Dict:
+    """Parse a dataset file once per process (callers must not mutate it)"""
+    data = dataset_path.read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+try:
+    from prompts.prompting_strategies import get_prompt
+except ImportError:
+    # Run as a script from evaluation/: make the project root importable
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from prompts.prompting_strategies import get_prompt
 
 @dataclass
 class EvaluationResult:
@@ -22,8 +54,8 @@ class EvaluationResult:
     difficulty: str
     strategy: str
     model: str
-    prompt: str
-    generated_code: str
+    prompt_path: str
+    code_path: str
     compilation_success: bool
     compilation_error: Optional[str]
     syntax_correct: bool
@@ -31,15 +63,56 @@ class EvaluationResult:
     execution_time: float
     timestamp: str
 
+# compile_code's Main wrapping: the constructor line a leading fun is moved
+# under, and line starts (for indenting the moved fun)
+_CREATE_LINE_RE = re.compile(r"^.*new create\(env: Env\) =>.*$", re.MULTILINE)
+_LINE_START_RE = re.compile(r"^", re.MULTILINE)
+
+# Stands in for the compile work dir in error messages (see _strip_work_dir)
+WORK_DIR_PLACEHOLDER = "<work_dir>"
+
 class PonyCompiler:
     """Handle Pony code compilation"""
     
-    def __init__(self, ponyc_path: str = "ponyc"):
+    # ponyc_path -> version string, so the `ponyc --version` probe runs once
+    # per process rather than once per PonyCompiler instance
+    _versions: Dict[str, str] = {}
+    _versions_lock = threading.Lock()
+    
+    def __init__(
+        self,
+        ponyc_path: str = "ponyc",
+        cache_file: Optional[Path] = None,
+        fast_check: bool = True
+    ):
         self.ponyc_path = ponyc_path
+        self.version = ""
+        # Stop after the last type-checking pass: compilation_success only
+        # needs parse + typecheck, not LLVM codegen and linking
+        self.fast_check = fast_check
+        self.pass_args = ["--pass=paint"] if fast_check else []
         self._check_compiler()
+        
+        # sha256(ponyc version + pass flags + code) -> (success, error), persisted as NDJSON
+        self.cache_file = cache_file
+        self._compile_cache: Dict[str, Tuple[bool, Optional[str]]] = {}
+        self._cache_lock = threading.Lock()
+        if self.cache_file is not None and self.cache_file.exists():
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from an interrupted run
+                    self._compile_cache[entry['key']] = (entry['success'], entry['error'])
     
     def _check_compiler(self):
         """Verify ponyc is available"""
+        with PonyCompiler._versions_lock:
+            version = PonyCompiler._versions.get(self.ponyc_path)
+        if version is not None:
+            self.version = version
+            return
         try:
             result = subprocess.run(
                 [self.ponyc_path, "--version"],
@@ -49,7 +122,10 @@ class PonyCompiler:
             )
             if result.returncode != 0:
                 raise RuntimeError("ponyc not found or not working")
-            print(f"Found Pony compiler: {result.stdout.strip()}")
+            self.version = result.stdout.strip()
+            print(f"Found Pony compiler: {self.version}")
+            with PonyCompiler._versions_lock:
+                PonyCompiler._versions[self.ponyc_path] = self.version
         except FileNotFoundError:
             raise RuntimeError("ponyc not found. Please install Pony: https://www.ponylang.io/")
         except Exception as e:
@@ -69,23 +145,15 @@ class PonyCompiler:
             if before_main:
             # If it's a standalone function, move it INSIDE Main
                 if before_main.startswith("fun "):
-                    # Find where to insert: after "new create(env: Env) =>"
-                    lines = main_and_after.split('\n')
-                    new_lines = []
-                    inserted = False
-                
-                    for i, line in enumerate(lines):
-                        new_lines.append(line)
-                    # Insert after the create line
-                        if 'new create(env: Env) =>' in line and not inserted:
-                            # Indent the function and add it
-                            func_lines = before_main.split('\n')
-                            for func_line in func_lines:
-                                new_lines.append('  ' + func_line)
-                            new_lines.append('')  # blank line
-                            inserted = True
-                
-                    code = "actor Main\n" + '\n'.join(new_lines)
+                    # Insert it, indented, after the "new create(env: Env) =>" line
+                    func = _LINE_START_RE.sub("  ", before_main)
+                    main_and_after, inserted = _CREATE_LINE_RE.subn(
+                        lambda m: f"{m.group(0)}\n{func}\n", main_and_after, count=1
+                    )
+                    if inserted:
+                        code = "actor Main\n" + main_and_after
+                    else:
+                        code = before_main + "\n\nactor Main" + main_and_after
                 else:
                 # It's object/class/primitive - keep before Main
                     code = before_main + "\n\nactor Main" + main_and_after
@@ -101,47 +169,200 @@ class PonyCompiler:
 {code}
 """
     
+        flags = " ".join(self.pass_args)
+        cache_key = hashlib.sha256(f"{self.version}\0{flags}\0{code}".encode('utf-8')).hexdigest()
+        with self._cache_lock:
+            cached = self._compile_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
         main_file.write_text(code)
+        
+        # The work dir is reused across retries: drop the previous attempt's
+        # build outputs so a stale binary can't be mistaken for this one's
+        for stale in work_dir.glob('*.o'):
+            stale.unlink()
+        binary = work_dir / work_dir.name
+        if binary.exists():
+            binary.unlink()
     
         try:
             result = subprocess.run(
-                [self.ponyc_path, str(work_dir)],
+                [self.ponyc_path, *self.pass_args, f"--output={work_dir}", str(work_dir)],
                 capture_output=True,
-                text=True,
                 timeout=30
             )
         
-            output = result.stdout + result.stderr
-        
-            if (result.returncode == 0 or 
-                "Verifying" in output or 
-                "Writing" in output):
-                return True, None
+            # Output stays as bytes; it is only scanned and decoded on failure
+            if result.returncode == 0:
+                outcome = (True, None)
             else:
-                return False, result.stderr
+                output = result.stdout + result.stderr
+                if b"Verifying" in output or b"Writing" in output:
+                    outcome = (True, None)
+                else:
+                    error = result.stderr.decode('utf-8', errors='replace')
+                    outcome = (False, self._strip_work_dir(error, work_dir))
+            self._store_cached(cache_key, outcome)
+            return outcome
     
         except subprocess.TimeoutExpired:
             return False, "Compilation timeout (30s)"
         except Exception as e:
             return False, f"Compilation error: {str(e)}"
 
+    @staticmethod
+    def _strip_work_dir(message: str, work_dir: Path) -> str:
+        """Replace the per-run work dir in compiler output, so cached messages stay valid"""
+        # Longest first: the resolved path may extend the given one (e.g. /private/tmp)
+        for path in sorted({str(work_dir.resolve()), str(work_dir.absolute())}, key=len, reverse=True):
+            message = message.replace(path, WORK_DIR_PLACEHOLDER)
+        return message
+    
+    def _store_cached(self, cache_key: str, outcome: Tuple[bool, Optional[str]]):
+        """Remember a compiler verdict (timeouts and crashes are not cached)"""
+        with self._cache_lock:
+            self._compile_cache[cache_key] = outcome
+            if self.cache_file is not None:
+                with open(self.cache_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': cache_key, 'success': outcome[0], 'error': outcome[1]}) + "\n")
+
+class LLMConfigError(RuntimeError):
+    """The LLM client cannot work at all (no API key, library missing)"""
+
+class RateLimiter:
+    """Sliding-window limiter: at most `rpm` acquisitions in any 60s window"""
+    
+    def __init__(self, rpm: int = 15):
+        self.rpm = rpm
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block only as long as needed to stay under the per-minute quota"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= 60:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.rpm:
+                    self._timestamps.append(now)
+                    return
+                wait = 60 - (now - self._timestamps[0])
+            time.sleep(wait)
+
+# On-disk LLM response cache, used only when a run opts in (shared by every such run)
+LLM_CACHE_DIR = Path(__file__).parent / '.llm_cache'
+
 class LLMClient:
     """Generic LLM client interface"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrent: int = 4,
+        rpm: int = 15,
+        cache_dir: Optional[Path] = None,
+        max_output_tokens: int = 2048
+    ):
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
         if not self.api_key:
             print("Warning: No API key found. Set GEMINI_API_KEY environment variable.")
-    
-    def generate(self, prompt: str, model: str = "gemini-pro") -> str:
+        # Bounds in-flight API requests when evaluations run on a thread pool
+        self._semaphore = threading.Semaphore(max_concurrent)
+        # Requests per minute allowed by the API quota (Gemini free tier ~15)
+        self._rate_limiter = RateLimiter(rpm)
+        self.generation_config = {
+            'temperature': 0.7,  # Higher temperature for more variety (0.0 = deterministic, 1.0 = very random)
+            'max_output_tokens': max_output_tokens,
+        }
+        # Content-addressed response cache (None, the default, disables it)
+        self.cache_dir = cache_dir
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Requests currently being answered, so identical concurrent requests
+        # (e.g. two strategies rendering the same prompt) share one API call
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        # Responses served from the disk cache instead of the API
+        self.cache_hits = 0
+        # GenerativeModel per model name, built once (genai is configured on first use)
+        self._models: Dict[str, object] = {}
+        self._models_lock = threading.Lock()
+    
+    def generate(self, prompt: str, model: str = "gemini-pro", sample: int = 0, no_cache: bool = False) -> str:
         """
         Generate code from prompt using specified model
         
-        Note: This is a placeholder. Implement actual API calls.
+        With a cache_dir, responses are cached on disk by (model, prompt,
+        sample). Retries pass a different `sample` index so each attempt still
+        gets a fresh response, while re-running the same configuration replays
+        earlier ones. Identical requests issued concurrently wait for a single
+        API call.
         """
-        # For now, return a placeholder
-        # In production, call the actual Gemini API
-        return self._call_gemini_api(prompt, model)
+        if no_cache:
+            with self._semaphore:
+                return self._call_gemini_api(prompt, model)
+        
+        # The output-token cap changes responses, so it is part of the key
+        max_tokens = self.generation_config['max_output_tokens']
+        key = hashlib.sha256(f"{model}\0{max_tokens}\0{sample}\0{prompt}".encode('utf-8')).hexdigest()
+        cache_file = None
+        if self.cache_dir is not None:
+            cache_file = self.cache_dir / f"{key}.txt"
+            if cache_file.exists():
+                with self._inflight_lock:
+                    self.cache_hits += 1
+                return cache_file.read_text(encoding='utf-8')
+        
+        # Join an identical request that is already in flight
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._inflight[key] = future = Future()
+        if pending is not None:
+            return pending.result()
+        
+        try:
+            # A request for this key may have finished (cached and left
+            # _inflight) between the cache check above and registering ours
+            if cache_file is not None and cache_file.exists():
+                with self._inflight_lock:
+                    self.cache_hits += 1
+                response = cache_file.read_text(encoding='utf-8')
+                future.set_result(response)
+                return response
+            with self._semaphore:
+                response = self._call_gemini_api(prompt, model)
+            # Never cache error placeholders
+            if cache_file is not None and not response.startswith("# Error"):
+                self._write_cache(cache_file, response)
+            future.set_result(response)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return response
+    
+    def _write_cache(self, cache_file: Path, response: str):
+        """Atomically write a cached response (safe with concurrent writers)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(response)
+        os.replace(tmp_path, cache_file)
+    
+    def _get_model(self, model: str):
+        """Return the shared GenerativeModel for `model`, configuring genai once"""
+        import google.generativeai as genai
+        
+        with self._models_lock:
+            if not self._models:
+                genai.configure(api_key=self.api_key)
+            if model not in self._models:
+                self._models[model] = genai.GenerativeModel(model)
+            return self._models[model]
     
     def _call_gemini_api(self, prompt: str, model: str) -> str:
         """
@@ -150,22 +371,16 @@ class LLMClient:
         Implement this with actual API calls using google-generativeai library
         """
         try:
-            import google.generativeai as genai
-            
             if not self.api_key:
                 return "# Error: No API key configured"
             
-            genai.configure(api_key=self.api_key)
-            model_instance = genai.GenerativeModel(model)
+            model_instance = self._get_model(model)
             
-            response = model_instance.generate_content(prompt)
-
-            generation_config = {
-                'temperature': 0.7,  # Higher temperature for more variety (0.0 = deterministic, 1.0 = very random)
-                'max_output_tokens': 2048,
-            }
-
-            time.sleep(3.5)
+            self._rate_limiter.acquire()
+            response = model_instance.generate_content(
+                prompt,
+                generation_config=self.generation_config
+            )
 
             return response.text
         
@@ -174,37 +389,54 @@ class LLMClient:
         except Exception as e:
             return f"# Error calling API: {str(e)}"
 
+# API errors worth waiting out rather than giving up on
+_QUOTA_ERROR_RE = re.compile(r"429|quota|resource.?exhausted|rate.?limit", re.IGNORECASE)
+
+# Patterns used by extract_code_from_response, compiled once
+_PONY_BLOCK_RE = re.compile(r"```pony\n(.*?)\n```", re.DOTALL)
+_GENERIC_BLOCK_RE = re.compile(r"```\n(.*?)\n```", re.DOTALL)
+_PONY_KEYWORD_RE = re.compile(r"\b(?:actor|class|primitive|fun|be)\b")
+_CODE_START_RE = re.compile(r"\b(?:actor|class|primitive|fun)\b")
+_EXPLANATION_RE = re.compile(r"here|example|explanation|###|how to", re.IGNORECASE)
+
 def extract_code_from_response(response: str) -> str:
     """Extract Pony code from LLM response"""
+    # Without a fence there are no blocks to find; skip both block scans
+    has_fence = '```' in response
+    
     # Try to find code in markdown blocks
-    pony_pattern = r"```pony\n(.*?)\n```"
-    matches = re.findall(pony_pattern, response, re.DOTALL)
+    matches = _PONY_BLOCK_RE.findall(response) if has_fence else None
     
     if matches:
         return matches[-1].strip()  # Return last code block
     
     # Try generic code blocks
-    code_pattern = r"```\n(.*?)\n```"
-    matches = re.findall(code_pattern, response, re.DOTALL)
+    matches = _GENERIC_BLOCK_RE.findall(response) if has_fence else None
     
     if matches:
         # Filter out non-Pony code (check for Pony keywords)
         for match in reversed(matches):
-            if any(keyword in match for keyword in ['actor', 'class', 'primitive', 'fun', 'be']):
+            if _PONY_KEYWORD_RE.search(match):
                 return match.strip()
         return matches[-1].strip()
     
-    # If no code blocks, look for code after common headers
-    lines = response.split('\n')
+    # If no code blocks, look for code after common headers. Usually no line
+    # needs skipping, so the code is everything from the first marker's line
+    if _EXPLANATION_RE.search(response) is None:
+        start = _CODE_START_RE.search(response)
+        if start is None:
+            return response.strip()
+        return response[response.rfind('\n', 0, start.start()) + 1:].strip()
+    
     code_started = False
     code_lines = []
     
-    for line in lines:
+    for line in response.split('\n'):
         # Skip explanatory text
-        if any(skip in line.lower() for skip in ['here', 'example', 'explanation', '###', 'how to']):
+        if _EXPLANATION_RE.search(line):
             continue
         # Look for Pony code markers
-        if any(keyword in line for keyword in ['actor', 'class', 'primitive', 'fun']):
+        if not code_started and _CODE_START_RE.search(line):
             code_started = True
         if code_started:
             code_lines.append(line)
@@ -215,26 +447,45 @@ def extract_code_from_response(response: str) -> str:
     # Last resort: return the whole response
     return response.strip()
 
+# clean_pony_code fixes, fused into one pattern. Alternatives are ordered so a
+# comparison or array literal is matched whole (its numeric suffixes are
+# stripped in _clean_match) before the bare numeric-suffix rule can claim it.
+_CLEAN_RE = re.compile(
+    r"(?P<cmp>\b(?P<lhs>\w+\s*==\s*\w+)\s+(?P<op>or|and)\s+(?P<rhs>\w+\s*==\s*\w+))"
+    r"|(?P<arr>\[(?P<items>[^\]]+)\]\.values\(\))"
+    r"|(?P<pkg>^package\s+\w+\s*\n)"
+    r"|(?P<digits>\d+)[Uu]\b",
+    re.MULTILINE
+)
+_NUM_SUFFIX_RE = re.compile(r"(\d+)[Uu]\b")
+_IF_THEN_RE = re.compile(r"\bif\b.*\bthen\b")
+_END_RE = re.compile(r"\bend\b")
+
+def _clean_match(m: re.Match) -> str:
+    """Replacement for one _CLEAN_RE match"""
+    if m.group('cmp') is not None:
+        # Fix operator precedence: "n == 0 or n == 1" -> "(n == 0) or (n == 1)"
+        lhs = _NUM_SUFFIX_RE.sub(r"\1", m.group('lhs'))
+        rhs = _NUM_SUFFIX_RE.sub(r"\1", m.group('rhs'))
+        return f"({lhs}) {m.group('op')} ({rhs})"
+    if m.group('arr') is not None:
+        # Fix .values() on array literals
+        return "[" + _NUM_SUFFIX_RE.sub(r"\1", m.group('items')) + "]"
+    if m.group('pkg') is not None:
+        # Remove package declarations
+        return ""
+    # Remove numeric suffixes
+    return m.group('digits')
+
 def clean_pony_code(code: str) -> str:
     """Fix common LLM errors in Pony code"""
-    # Remove numeric suffixes
-    code = re.sub(r'(\d+)[Uu]\b', r'\1', code)
-    
-    # Remove package declarations
-    code = re.sub(r'^package\s+\w+\s*\n', '', code, flags=re.MULTILINE)
-    
-    # Fix .values() on array literals
-    code = re.sub(r'\[([^\]]+)\]\.values\(\)', r'[\1]', code)
-    
-    # Fix operator precedence: "n == 0 or n == 1" -> "(n == 0) or (n == 1)"
-    code = re.sub(r'\b(\w+\s*==\s*\w+)\s+(or|and)\s+(\w+\s*==\s*\w+)', r'(\1) \2 (\3)', code)
+    code = _CLEAN_RE.sub(_clean_match, code)
     
     # Add missing ends
-    if_count = len(re.findall(r'\bif\b.*\bthen\b', code))
-    end_count = len(re.findall(r'\bend\b', code))
-    while end_count < if_count:
-        code += '\n    end'
-        end_count += 1
+    if_count = sum(1 for _ in _IF_THEN_RE.finditer(code))
+    end_count = sum(1 for _ in _END_RE.finditer(code))
+    if end_count < if_count:
+        code += '\n    end' * (if_count - end_count)
     
     return code.strip()
 
@@ -247,17 +498,35 @@ class Evaluator:
         output_dir: Path,
         strategies: List[str],
         models: List[str],
-        max_retries: int = 5
+        max_retries: int = 5,
+        max_workers: int = 8,
+        max_concurrent: int = 4,
+        pretty_results: bool = False,
+        fast_check: bool = True,
+        rpm: int = 15,
+        llm_cache: bool = False,
+        max_output_tokens: int = 2048
     ):
         self.dataset_path = dataset_path
         self.output_dir = output_dir
         self.strategies = strategies
         self.models = models
         self.max_retries = max_retries
+        self.max_workers = max_workers
+        self.pretty_results = pretty_results
 
-        self.compiler = PonyCompiler()
-        self.llm_client = LLMClient()
+        self.compiler = PonyCompiler(
+            cache_file=Path(__file__).parent / '.compile_cache.ndjson',
+            fast_check=fast_check
+        )
+        self.llm_client = LLMClient(
+            max_concurrent=max_concurrent,
+            rpm=rpm,
+            cache_dir=LLM_CACHE_DIR if llm_cache else None,
+            max_output_tokens=max_output_tokens
+        )
         self.results: List[EvaluationResult] = []
+        self._results_lock = threading.Lock()
         
         # Create output directories
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -267,11 +536,10 @@ class Evaluator:
         self.work_dir.mkdir(exist_ok=True)
     
     def load_dataset(self) -> Dict:
-        """Load task dataset"""
-        with open(self.dataset_path, 'r') as f:
-            return json.load(f)
+        """Load task dataset (shared between Evaluators reading the same file)"""
+        return _read_dataset(self.dataset_path)
     
-    def evaluate_task(self, task: dict, strategy: str, model: str) -> dict:
+    def evaluate_task(self, task: dict, strategy: str, model: str, prompt: Optional[str] = None) -> dict:
         """Evaluate a single task with retry logic - tracks all attempts"""
         task_id = task['id']
         category = task['category']
@@ -280,6 +548,18 @@ class Evaluator:
     
         print(f"\nEvaluating: {task_id} | Strategy: {strategy} | Model: {model}")
     
+        # The prompt and output paths are the same for every attempt
+        if prompt is None:
+            prompt = get_prompt(strategy, description, category)
+        code_file = self.code_dir / f"{task_id}_{strategy}_{model}.pony"
+        prompt_file = self.code_dir / f"{task_id}_{strategy}_{model}.prompt.txt"
+        prompt_file.write_text(prompt)
+        # Results reference the bodies on disk instead of holding them in memory
+        code_path = str(code_file.relative_to(self.output_dir))
+        prompt_path = str(prompt_file.relative_to(self.output_dir))
+        work_dir = self.work_dir / f"{task_id}_{strategy}_{model}"
+        work_dir.mkdir(parents=True, exist_ok=True)
+    
         all_attempts = []
     
         for attempt in range(self.max_retries):
@@ -288,26 +568,29 @@ class Evaluator:
         
             start_time = time.time()
         
-        # Generate prompt
-            prompt = get_prompt(strategy, description, category)
-        
         # Query LLM
             print("  Querying LLM...")
-            response = self.llm_client.generate(prompt, model)
-            generated_code = extract_code_from_response(response)
-            generated_code = clean_pony_code(generated_code)
-        
-        # Save generated code (only save final attempt to avoid clutter)
-            if attempt == 0 or attempt == self.max_retries - 1:
-                code_file = self.output_dir / "generated_code" / f"{task_id}_{strategy}_{model}.pony"
-                code_file.write_text(generated_code)
+            response = self._query_llm(prompt, model, attempt)
+            llm_failed = response.startswith("# Error")
+            if llm_failed:
+                # "# Error: ..." means no request can succeed; stop the whole run
+                if response.startswith("# Error:"):
+                    raise LLMConfigError(response[len("# Error:"):].strip())
+                generated_code = ""
+            else:
+                generated_code = extract_code_from_response(response)
+                generated_code = clean_pony_code(generated_code)
         
-        # Compile
-            print("  Compiling...")
-            work_dir = self.output_dir / "compilation_work" / f"{task_id}_{strategy}_{model}_attempt{attempt + 1}"
-            work_dir.mkdir(parents=True, exist_ok=True)
+        # Save generated code (each attempt overwrites the last, so the file
+        # always matches the attempt that ends up in the result)
+            code_file.write_text(generated_code)
         
-            success, error = self.compiler.compile_code(generated_code, work_dir)
+        # Compile (an LLM error placeholder would always fail, so skip ponyc)
+            if llm_failed:
+                success, error = False, f"LLM_ERROR: {response[2:]}"
+            else:
+                print("  Compiling...")
+                success, error = self.compiler.compile_code(generated_code, work_dir)
         
             execution_time = time.time() - start_time
         
@@ -318,8 +601,8 @@ class Evaluator:
                 'difficulty': difficulty,
                 'strategy': strategy,
                 'model': model,
-                'prompt': prompt,
-                'generated_code': generated_code,
+                'prompt_path': prompt_path,
+                'code_path': code_path,
                 'compilation_success': success,
                 'compilation_error': error,
                 'syntax_correct': success,
@@ -337,6 +620,11 @@ class Evaluator:
                 result['retry_count'] = attempt
                 result['total_attempts'] = attempt + 1
                 return result
+            elif llm_failed:
+                print(f"  ✗ {error}")
+                result['retry_count'] = attempt
+                result['total_attempts'] = attempt + 1
+                return result
             else:
                 # Truncate error message for display
                 if error:
@@ -355,6 +643,20 @@ class Evaluator:
         final_result['total_attempts'] = self.max_retries
         return final_result
     
+    def _query_llm(self, prompt: str, model: str, sample: int) -> str:
+        """Query the LLM, backing off while the API reports quota exhaustion"""
+        for backoff in range(self.max_retries):
+            response = self.llm_client.generate(prompt, model, sample=sample)
+            if not (response.startswith("# Error") and _QUOTA_ERROR_RE.search(response)):
+                break
+            # No point waiting when no attempt follows
+            if backoff == self.max_retries - 1:
+                break
+            delay = 5 * 2 ** backoff
+            print(f"  API quota exhausted, retrying in {delay}s...")
+            time.sleep(delay)
+        return response
+    
     def run_evaluation(self, task_filter: Optional[List[str]] = None):
         """Run full evaluation across all tasks, strategies, and models"""
         dataset = self.load_dataset()
@@ -363,7 +665,14 @@ class Evaluator:
         if task_filter:
             tasks = [t for t in tasks if t['id'] in task_filter]
         
-        total = len(tasks) * len(self.strategies) * len(self.models)
+        combos = list(itertools.product(tasks, self.strategies, self.models))
+        # Prompts depend only on (task, strategy): build each once, not per model/attempt
+        prompts = {
+            (task['id'], strategy): get_prompt(strategy, task['prompt'], task['category'])
+            for task in tasks
+            for strategy in self.strategies
+        }
+        total = len(combos)
         current = 0
         
         print(f"\n{'='*60}")
@@ -372,35 +681,92 @@ class Evaluator:
         print(f"Strategies: {len(self.strategies)}")
         print(f"Models: {len(self.models)}")
         print(f"Total evaluations: {total}")
+        print(f"Workers: {self.max_workers}")
+        if self.llm_client.cache_dir is not None:
+            print(f"LLM response cache: {self.llm_client.cache_dir} (replaying earlier responses where cached)")
         print(f"{'='*60}\n")
         
-        for task in tasks:
-            for strategy in self.strategies:
-                for model in self.models:
+        # Persist whatever finished if the process exits before the final save
+        atexit.register(self._save_partial_results)
+        
+        # Each result is also appended to an NDJSON log as soon as it completes,
+        # so a crash never loses finished evaluations
+        ndjson_file = self.output_dir / "evaluation_results.ndjson"
+        
+        # Each evaluation blocks on the LLM and on ponyc, so run them on a
+        # thread pool; LLMClient bounds the number of concurrent API calls
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        try:
+            with open(ndjson_file, 'a', buffering=1, encoding='utf-8') as log:
+                futures = {
+                    executor.submit(
+                        self.evaluate_task, task, strategy, model, prompts[(task['id'], strategy)]
+                    ): task['id']
+                    for task, strategy, model in combos
+                }
+                for future in as_completed(futures):
                     current += 1
                     print(f"\nProgress: {current}/{total}")
                     
                     try:
-                        result = self.evaluate_task(task, strategy, model)
-                        self.results.append(result)
+                        result = future.result()
+                    except LLMConfigError as e:
+                        print(f"\nLLM client unusable, stopping evaluation: {e}")
+                        for pending in futures:
+                            pending.cancel()
+                        break
                     except Exception as e:
-                        print(f"Error evaluating {task['id']}: {type(e).__name__}: {str(e)}")
-                        import traceback
+                        print(f"Error evaluating {futures[future]}: {type(e).__name__}: {str(e)}")
                         traceback.print_exc()
                         continue
+                    
+                    with self._results_lock:
+                        self.results.append(result)
+                        log.write(_dump_json_bytes(result).decode('utf-8') + "\n")
+        except BaseException:
+            # Ctrl-C or a crash: drop the queued combos instead of letting
+            # shutdown run every remaining LLM call and compile for nothing
+            for pending in futures:
+                pending.cancel()
+            executor.shutdown(wait=False)
+            raise
+        executor.shutdown()
+        
+        if self.llm_client.cache_hits:
+            print(f"\nReused {self.llm_client.cache_hits} cached LLM responses instead of sampling new ones")
         
         # Save results
+        atexit.unregister(self._save_partial_results)
         self.save_results()
         self.generate_report()
     
+    def _save_partial_results(self):
+        """Exit hook: save results collected so far by an interrupted run"""
+        if self.results:
+            print("\nEvaluation interrupted, saving partial results...")
+            self.save_results()
+    
     def save_results(self):
         """Save detailed results to JSON"""
         results_file = self.output_dir / "evaluation_results.json"
         
-        with open(results_file, 'w') as f:
-            json.dump(self.results, f, indent=2)
+        # Compact machine-read output, streamed one record at a time
+        with open(results_file, 'wb') as f:
+            f.write(b'[')
+            for i, result in enumerate(self.results):
+                if i:
+                    f.write(b',\n')
+                f.write(_dump_json_bytes(result))
+            f.write(b']\n')
         
         print(f"\n✓ Results saved to {results_file}")
+        
+        if self.pretty_results:
+            pretty_file = self.output_dir / "evaluation_results_pretty.json"
+            with open(pretty_file, 'w') as f:
+                json.dump(self.results, f, indent=2)
+            print(f"✓ Pretty-printed results saved to {pretty_file}")
     
     def generate_report(self):
         """Generate summary report"""
@@ -428,34 +794,36 @@ class Evaluator:
                 by_category[result['category']] = []
             by_category[result['category']].append(result)
         
-        with open(report_file, 'w') as f:
-            f.write("=" * 60 + "\n")
-            f.write("PONY LLM CODE SYNTHESIS EVALUATION REPORT\n")
-            f.write("=" * 60 + "\n\n")
-            
-            f.write(f"Total Evaluations: {total}\n")
-            f.write(f"Compilation Success Rate: {compiled/total*100:.1f}% ({compiled}/{total})\n\n")
-            
-            f.write("=" * 60 + "\n")
-            f.write("RESULTS BY STRATEGY\n")
-            f.write("=" * 60 + "\n\n")
-            
-            for strategy, results in sorted(by_strategy.items()):
-                success = sum(1 for r in results if r['compilation_success'])
-                rate = success / len(results) * 100
-                f.write(f"{strategy}:\n")
-                f.write(f"  Success Rate: {rate:.1f}% ({success}/{len(results)})\n")
-                f.write(f"  Avg Time: {sum(r['execution_time'] for r in results)/len(results):.2f}s\n\n")
-            
-            f.write("=" * 60 + "\n")
-            f.write("RESULTS BY CATEGORY\n")
-            f.write("=" * 60 + "\n\n")
-            
-            for category, results in sorted(by_category.items()):
-                success = sum(1 for r in results if r['compilation_success'])
-                rate = success / len(results) * 100
-                f.write(f"{category}:\n")
-                f.write(f"  Success Rate: {rate:.1f}% ({success}/{len(results)})\n\n")
+        # Build the whole report in memory and write it with a single call
+        chunks = [
+            "=" * 60 + "\n",
+            "PONY LLM CODE SYNTHESIS EVALUATION REPORT\n",
+            "=" * 60 + "\n\n",
+            f"Total Evaluations: {total}\n",
+            f"Compilation Success Rate: {compiled/total*100:.1f}% ({compiled}/{total})\n\n",
+            "=" * 60 + "\n",
+            "RESULTS BY STRATEGY\n",
+            "=" * 60 + "\n\n",
+        ]
+        
+        for strategy, results in sorted(by_strategy.items()):
+            success = sum(1 for r in results if r['compilation_success'])
+            rate = success / len(results) * 100
+            chunks.append(f"{strategy}:\n")
+            chunks.append(f"  Success Rate: {rate:.1f}% ({success}/{len(results)})\n")
+            chunks.append(f"  Avg Time: {sum(r['execution_time'] for r in results)/len(results):.2f}s\n\n")
+        
+        chunks.append("=" * 60 + "\n")
+        chunks.append("RESULTS BY CATEGORY\n")
+        chunks.append("=" * 60 + "\n\n")
+        
+        for category, results in sorted(by_category.items()):
+            success = sum(1 for r in results if r['compilation_success'])
+            rate = success / len(results) * 100
+            chunks.append(f"{category}:\n")
+            chunks.append(f"  Success Rate: {rate:.1f}% ({success}/{len(results)})\n\n")
+        
+        report_file.write_text("".join(chunks))
         
         print(f"✓ Report saved to {report_file}")
         
@@ -472,6 +840,37 @@ class Evaluator:
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Run the Pony LLM evaluation")
+    parser.add_argument(
+        '--pretty', action='store_true',
+        help="Also write an indented evaluation_results_pretty.json"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=8,
+        help="Evaluations run in parallel (each queries the LLM, then compiles)"
+    )
+    parser.add_argument(
+        '--max-concurrent', type=int, default=4,
+        help="API requests allowed in flight at once (still bounded by the rate limiter)"
+    )
+    parser.add_argument(
+        '--rpm', type=int, default=15,
+        help="API requests per minute allowed by your quota"
+    )
+    parser.add_argument(
+        '--max-output-tokens', type=int, default=2048,
+        help="Response length cap sent to the API (raise it if long answers get truncated)"
+    )
+    parser.add_argument(
+        '--llm-cache', action='store_true',
+        help="Replay cached LLM responses from earlier runs (re-runs are then not independent samples)"
+    )
+    parser.add_argument(
+        '--full-compile', action='store_true',
+        help="Run ponyc through codegen and linking instead of stopping after type checking"
+    )
+    args = parser.parse_args()
+    
     # Configuration
     BASE_DIR = Path(__file__).parent.parent
     DATASET_PATH = BASE_DIR / "dataset" / "pony_tasks.json"
@@ -506,7 +905,14 @@ def main():
         output_dir=OUTPUT_DIR,
         strategies=STRATEGIES,
         models=MODELS,
-        max_retries=5
+        max_retries=5,
+        max_workers=args.workers,
+        max_concurrent=args.max_concurrent,
+        pretty_results=args.pretty,
+        fast_check=not args.full_compile,
+        rpm=args.rpm,
+        max_output_tokens=args.max_output_tokens,
+        llm_cache=args.llm_cache
     )
     
     evaluator.run_evaluation(task_filter=TASK_FILTER)
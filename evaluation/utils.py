@@ -3,17 +3,80 @@
 Utility functions for Pony LLM Evaluation Framework
 """
 
+import bisect
+import functools
 import json
+import mmap
 import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+# Patterns compiled once at import instead of on every call
+_CAP_RE = re.compile(r'\b(iso|trn|ref|val|box|tag)\b')
+# One bit per reference capability, in the order they are reported
+_CAP_BITS = {'iso': 1, 'trn': 2, 'ref': 4, 'val': 8, 'box': 16, 'tag': 32}
+_ALL_CAPS = 63
+_CAP_BITS_B = {cap.encode('ascii'): bit for cap, bit in _CAP_BITS.items()}
+_ACTOR_RE = re.compile(r'\bactor\s+\w+')
+_BEHAVIOR_RE = re.compile(r'\s+be\s+\w+')
+# analyze_pony_code's single pass: capabilities, actors and behaviors together
+_ANALYZE_RE = re.compile(r'\b(?P<cap>iso|trn|ref|val|box|tag)\b|(?P<actor>\bactor\s+\w+)|(?P<be>\s+be\s+\w+)')
+# Byte-mode twin for scanning mmapped files without decoding them
+_ANALYZE_RE_B = re.compile(_ANALYZE_RE.pattern.encode('ascii'))
+_SANITIZE_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+# A string literal (kept as-is), a line comment or a block comment
+_COMMENT_RE = re.compile(r'"(?:\\.|[^"\\])*"|//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+_BRACE_RE = re.compile(r'[{}]')
+
+_SYNTAX_CHECKS = (
+    (re.compile(r'actor\s+\w+'), "No actor definition found"),
+    (re.compile(r'new\s+create\(.*?\)\s*=>'), "No constructor found"),
+)
+
+# Error categories in priority order (first hit wins), as plain substrings.
+# "expected ... got" (same line) is the only rule that needs a regex.
+_ERROR_KEYWORDS = (
+    ('syntax', ('syntax error', 'unexpected token')),
+    ('type', ('type mismatch',)),
+    ('capability', ('capability', 'sendable', 'recover')),
+    ('reference', ("can't find", 'undefined', 'not found')),
+    ('assignment', ("can't assign", 'immutable')),
+)
+_EXPECTED_GOT_RE = re.compile(r'expected.*got')
+
+# Files at least this large are parsed straight from a read-only mmap
+_MMAP_THRESHOLD = 64 * 1024 * 1024
+
 def load_json(file_path: Path) -> Dict:
     """Load JSON file safely"""
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        file_path = Path(file_path)
+        if orjson is not None and file_path.stat().st_size >= _MMAP_THRESHOLD:
+            # orjson parses the mapped pages directly, with no bytes copy
+            with open(file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    memoryview(mm) as view:
+                return orjson.loads(view)
+        data = file_path.read_bytes()
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {file_path}")
     except json.JSONDecodeError as e:
@@ -22,48 +85,109 @@ def load_json(file_path: Path) -> Dict:
 def save_json(data: Dict, file_path: Path, pretty: bool = True):
     """Save data to JSON file"""
     file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, 'w') as f:
-        if pretty:
-            json.dump(data, f, indent=2)
-        else:
-            json.dump(data, f)
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        encoded = orjson.dumps(data, option=option)
+    else:
+        encoded = json.dumps(data, indent=2 if pretty else None).encode('utf-8')
+    with open(file_path, 'wb') as f:
+        f.write(encoded)
 
 def extract_pony_capabilities(code: str) -> List[str]:
     """
     Extract reference capabilities used in Pony code
     Returns list of capabilities: iso, trn, ref, val, box, tag
     """
-    capabilities = []
-    capability_pattern = r'\b(iso|trn|ref|val|box|tag)\b'
-    matches = re.findall(capability_pattern, code)
-    return list(set(matches))  # Return unique capabilities
+    mask = 0
+    for m in _CAP_RE.finditer(code):
+        mask |= _CAP_BITS[m.group(1)]
+        if mask == _ALL_CAPS:
+            break
+    return _caps_from_mask(mask)
+
+def _caps_from_mask(mask: int) -> List[str]:
+    """Capability names whose bits are set in `mask`"""
+    return [cap for cap, bit in _CAP_BITS.items() if mask & bit]
 
 def count_actors(code: str) -> int:
     """Count number of actor definitions in code"""
-    return len(re.findall(r'\bactor\s+\w+', code))
+    return len(_ACTOR_RE.findall(code))
 
 def count_behaviors(code: str) -> int:
     """Count number of behavior definitions (be) in code"""
-    return len(re.findall(r'\s+be\s+\w+', code))
+    return len(_BEHAVIOR_RE.findall(code))
 
 def has_recover_block(code: str) -> bool:
     """Check if code uses recover blocks"""
     return 'recover' in code
 
+def _scan_code(code, pattern=_ANALYZE_RE, cap_bits=_CAP_BITS) -> Tuple[int, int, int]:
+    """Capability bitmask, actor count and behavior count in one regex pass"""
+    cap_mask = 0
+    num_actors = 0
+    num_behaviors = 0
+    for m in pattern.finditer(code):
+        if m.lastgroup == 'cap':
+            cap_mask |= cap_bits[m.group('cap')]
+        elif m.lastgroup == 'actor':
+            num_actors += 1
+        else:
+            num_behaviors += 1
+    return cap_mask, num_actors, num_behaviors
+
 def analyze_pony_code(code: str) -> Dict:
     """
     Analyze Pony code and extract features
     Returns dict with code characteristics
     """
+    cap_mask, num_actors, num_behaviors = _scan_code(code)
+    
     return {
-        'capabilities_used': extract_pony_capabilities(code),
-        'num_actors': count_actors(code),
-        'num_behaviors': count_behaviors(code),
+        'capabilities_used': _caps_from_mask(cap_mask),
+        'num_actors': num_actors,
+        'num_behaviors': num_behaviors,
         'uses_recover': has_recover_block(code),
-        'num_lines': len(code.split('\n')),
+        'num_lines': code.count('\n') + 1,
         'has_main': 'actor Main' in code
     }
 
+def analyze_pony_code_from_path(path: Path) -> Dict:
+    """
+    analyze_pony_code for a source file, scanning a read-only mmap of it
+    
+    The file is never copied into a str or decoded; patterns run on the raw
+    UTF-8 bytes, so word boundaries and whitespace follow ASCII rules.
+    """
+    path = Path(path)
+    if path.stat().st_size == 0:
+        return analyze_pony_code('')  # empty files can't be mmapped
+    
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        cap_mask, num_actors, num_behaviors = _scan_code(mm, _ANALYZE_RE_B, _CAP_BITS_B)
+        # Count newlines a window at a time rather than copying the whole file
+        window = 1 << 20
+        num_lines = 1 + sum(mm[i:i + window].count(b'\n') for i in range(0, len(mm), window))
+        return {
+            'capabilities_used': _caps_from_mask(cap_mask),
+            'num_actors': num_actors,
+            'num_behaviors': num_behaviors,
+            'uses_recover': mm.find(b'recover') != -1,
+            'num_lines': num_lines,
+            'has_main': mm.find(b'actor Main') != -1
+        }
+
+def analyze_many(codes: Iterable[str], workers: Optional[int] = None, chunksize: int = 32) -> List[Dict]:
+    """
+    analyze_pony_code over many snippets on a process pool
+    
+    Results come back in input order. The scan is CPU-bound regex work, so
+    processes (not threads) are used; workers=1 runs serially in-process.
+    """
+    if workers == 1:
+        return [analyze_pony_code(code) for code in codes]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_pony_code, codes, chunksize=chunksize))
+
 def format_duration(seconds: float) -> str:
     """Format duration in human-readable format"""
     if seconds < 60:
@@ -82,7 +206,7 @@ def create_timestamp() -> str:
 def sanitize_filename(name: str) -> str:
     """Sanitize string for use in filename"""
     # Remove invalid characters
-    name = re.sub(r'[<>:"/\\|?*]', '_', name)
+    name = name.translate(_SANITIZE_TABLE)
     # Limit length
     return name[:100]
 
@@ -94,37 +218,41 @@ def extract_error_type(error_message: str) -> str:
     if not error_message:
         return "unknown"
     
-    error_patterns = {
-        'syntax': r'syntax error|unexpected token',
-        'type': r'type mismatch|expected.*got',
-        'capability': r'capability|sendable|recover',
-        'reference': r'can\'t find|undefined|not found',
-        'assignment': r'can\'t assign|immutable',
-    }
-    
     error_lower = error_message.lower()
-    for error_type, pattern in error_patterns.items():
-        if re.search(pattern, error_lower):
+    for error_type, keywords in _ERROR_KEYWORDS:
+        if any(keyword in error_lower for keyword in keywords):
+            return error_type
+        if error_type == 'type' and 'expected' in error_lower and _EXPECTED_GOT_RE.search(error_lower):
             return error_type
     
     return "other"
 
+@functools.lru_cache(maxsize=512)
+def _word_set(text: str) -> FrozenSet[str]:
+    """Lowercased word set of `text` (cached: a reference is compared many times)"""
+    return frozenset(text.lower().split())
+
+@functools.lru_cache(maxsize=512)
+def _code_features(code: str) -> Tuple[int, int, int, bool]:
+    """(capability mask, actors, behaviors, uses recover) for compare_with_reference"""
+    return _scan_code(code) + (has_recover_block(code),)
+
 def calculate_similarity(str1: str, str2: str) -> float:
     """
     Calculate simple similarity score between two strings
     Returns value between 0 and 1
     """
     # Simple Jaccard similarity on words
-    words1 = set(str1.lower().split())
-    words2 = set(str2.lower().split())
+    words1 = _word_set(str1)
+    words2 = _word_set(str2)
     
     if not words1 and not words2:
         return 1.0
     if not words1 or not words2:
         return 0.0
     
-    intersection = len(words1.intersection(words2))
-    union = len(words1.union(words2))
+    intersection = len(words1 & words2)
+    union = len(words1 | words2)
     
     return intersection / union if union > 0 else 0.0
 
@@ -133,20 +261,27 @@ def compare_with_reference(generated: str, reference: str) -> Dict:
     Compare generated code with reference solution
     Returns dict with comparison metrics
     """
-    gen_analysis = analyze_pony_code(generated)
-    ref_analysis = analyze_pony_code(reference)
+    gen_caps, gen_actors, gen_behaviors, gen_recover = _code_features(generated)
+    ref_caps, ref_actors, ref_behaviors, ref_recover = _code_features(reference)
     
     return {
         'similarity_score': calculate_similarity(generated, reference),
-        'capabilities_match': set(gen_analysis['capabilities_used']) == set(ref_analysis['capabilities_used']),
-        'actors_match': gen_analysis['num_actors'] == ref_analysis['num_actors'],
-        'behaviors_match': gen_analysis['num_behaviors'] == ref_analysis['num_behaviors'],
-        'uses_recover_match': gen_analysis['uses_recover'] == ref_analysis['uses_recover']
+        'capabilities_match': gen_caps == ref_caps,
+        'actors_match': gen_actors == ref_actors,
+        'behaviors_match': gen_behaviors == ref_behaviors,
+        'uses_recover_match': gen_recover == ref_recover
     }
 
-def batch_process_results(results: List[Dict], batch_size: int = 10) -> List[List[Dict]]:
-    """Split results into batches for processing"""
-    return [results[i:i + batch_size] for i in range(0, len(results), batch_size)]
+def batch_process_results(results: Iterable[Dict], batch_size: int = 10) -> Iterator[List[Dict]]:
+    """
+    Split results into batches for processing
+    
+    Yields one batch at a time (wrap in list() for all of them), so any
+    iterable of results, including a streamed one, can be batched.
+    """
+    it = iter(results)
+    while batch := list(islice(it, batch_size)):
+        yield batch
 
 def filter_tasks_by_criteria(
     tasks: List[Dict],
@@ -157,43 +292,124 @@ def filter_tasks_by_criteria(
 ) -> List[Dict]:
     """
     Filter tasks based on various criteria
-    """
-    filtered = tasks
     
-    if category:
-        filtered = [t for t in filtered if t['category'] == category]
+    One pass over `tasks`; use TaskIndex when filtering the same tasks repeatedly.
+    """
+    check_id = min_id is not None or max_id is not None
+    filtered = []
     
-    if difficulty:
-        filtered = [t for t in filtered if t['difficulty'] == difficulty]
+    for t in tasks:
+        if category and t['category'] != category:
+            continue
+        if difficulty and t['difficulty'] != difficulty:
+            continue
+        if check_id:
+            # Parse the numeric id once per task, not once per bound
+            task_num = int(t['id'].split('_')[1])
+            if min_id is not None and task_num < min_id:
+                continue
+            if max_id is not None and task_num > max_id:
+                continue
+        filtered.append(t)
     
-    if min_id is not None:
-        filtered = [t for t in filtered if int(t['id'].split('_')[1]) >= min_id]
+    return filtered
+
+class TaskIndex:
+    """Tasks pre-indexed by category, difficulty and numeric id for repeated filtering"""
     
-    if max_id is not None:
-        filtered = [t for t in filtered if int(t['id'].split('_')[1]) <= max_id]
+    def __init__(self, tasks: Iterable[Dict]):
+        self.tasks = list(tasks)
+        self.by_category: Dict[str, List[int]] = defaultdict(list)
+        self.by_difficulty: Dict[str, List[int]] = defaultdict(list)
+        for pos, t in enumerate(self.tasks):
+            self.by_category[t['category']].append(pos)
+            self.by_difficulty[t['difficulty']].append(pos)
+        # (numeric id, position) sorted for range lookups with bisect
+        self._ids = sorted((int(t['id'].split('_')[1]), pos) for pos, t in enumerate(self.tasks))
+        self._id_keys = [task_num for task_num, _ in self._ids]
     
-    return filtered
+    def filter(
+        self,
+        category: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        min_id: Optional[int] = None,
+        max_id: Optional[int] = None
+    ) -> List[Dict]:
+        """Same result as filter_tasks_by_criteria, without scanning every task"""
+        candidates = None
+        
+        if category:
+            candidates = set(self.by_category.get(category, ()))
+        
+        if difficulty:
+            positions = self.by_difficulty.get(difficulty, ())
+            candidates = set(positions) if candidates is None else candidates.intersection(positions)
+        
+        if min_id is not None or max_id is not None:
+            lo = 0 if min_id is None else bisect.bisect_left(self._id_keys, min_id)
+            hi = len(self._ids) if max_id is None else bisect.bisect_right(self._id_keys, max_id)
+            positions = (pos for _, pos in self._ids[lo:hi])
+            candidates = set(positions) if candidates is None else candidates.intersection(positions)
+        
+        if candidates is None:
+            return list(self.tasks)
+        # Keep dataset order, as filter_tasks_by_criteria does
+        return [self.tasks[pos] for pos in sorted(candidates)]
+
+# Bar pieces sliced per update instead of rebuilt
+_BAR_FILL = '█' * 100
+_BAR_EMPTY = '-' * 100
+# Minimum seconds between redraws; the final update is always drawn
+_PROGRESS_INTERVAL = 0.1
+_last_progress_draw = 0.0
 
 def print_progress_bar(iteration: int, total: int, prefix: str = '', length: int = 50):
-    """Print a progress bar"""
+    """Print a progress bar (redraws are throttled to every _PROGRESS_INTERVAL seconds)"""
+    global _last_progress_draw
+    now = time.monotonic()
+    if iteration != total and now - _last_progress_draw < _PROGRESS_INTERVAL:
+        return
+    _last_progress_draw = now
+    
     percent = 100 * (iteration / float(total))
     filled = int(length * iteration // total)
-    bar = '█' * filled + '-' * (length - filled)
+    if length <= len(_BAR_FILL):
+        bar = _BAR_FILL[:filled] + _BAR_EMPTY[:length - filled]
+    else:
+        bar = '█' * filled + '-' * (length - filled)
     print(f'\r{prefix} |{bar}| {percent:.1f}% ({iteration}/{total})', end='\r')
     if iteration == total:
         print()
 
+def progress(iterable: Iterable, total: Optional[int] = None, prefix: str = ''):
+    """Iterate over `iterable` with a progress bar (tqdm when installed)"""
+    if tqdm is not None:
+        return tqdm(iterable, total=total, desc=prefix)
+    return _progress_fallback(iterable, total, prefix)
+
+def _progress_fallback(iterable: Iterable, total: Optional[int], prefix: str):
+    """Generator behind progress() when tqdm is not installed"""
+    if total is None:
+        total = len(iterable)
+    for i, item in enumerate(iterable, 1):
+        yield item
+        print_progress_bar(i, total, prefix)
+
 def get_task_stats(tasks: List[Dict]) -> Dict:
     """Get statistics about tasks in dataset"""
-    from collections import Counter
-    
-    categories = Counter(t['category'] for t in tasks)
-    difficulties = Counter(t['difficulty'] for t in tasks)
+    categories = {}
+    difficulties = {}
+    # Both tallies in one pass over the tasks
+    for t in tasks:
+        category = t['category']
+        categories[category] = categories.get(category, 0) + 1
+        difficulty = t['difficulty']
+        difficulties[difficulty] = difficulties.get(difficulty, 0) + 1
     
     return {
         'total_tasks': len(tasks),
-        'by_category': dict(categories),
-        'by_difficulty': dict(difficulties)
+        'by_category': categories,
+        'by_difficulty': difficulties
     }
 
 def validate_pony_syntax_basic(code: str) -> Tuple[bool, Optional[str]]:
@@ -201,17 +417,18 @@ def validate_pony_syntax_basic(code: str) -> Tuple[bool, Optional[str]]:
     Basic syntax validation without compiling
     Checks for common syntax errors
     """
-    checks = [
-        (r'actor\s+\w+', "No actor definition found"),
-        (r'new\s+create\(.*?\)\s*=>', "No constructor found"),
-    ]
-    
-    for pattern, error_msg in checks:
-        if not re.search(pattern, code):
+    for pattern, error_msg in _SYNTAX_CHECKS:
+        if not pattern.search(code):
             return False, error_msg
     
-    # Check for balanced braces (simple check)
-    if code.count('{') != code.count('}'):
+    # Check for balanced braces: one scan collects just the braces, then
+    # fail fast on a close without a matching open
+    depth = 0
+    for brace in _BRACE_RE.findall(code):
+        depth += 1 if brace == '{' else -1
+        if depth < 0:
+            return False, "Unbalanced braces"
+    if depth:
         return False, "Unbalanced braces"
     
     return True, None
@@ -234,12 +451,10 @@ class CodeFormatter:
     
     @staticmethod
     def remove_comments(code: str) -> str:
-        """Remove comments from Pony code"""
-        # Remove single-line comments
-        code = re.sub(r'//.*$', '', code, flags=re.MULTILINE)
-        # Remove multi-line comments
-        code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
-        return code
+        """Remove comments from Pony code (in one pass, leaving string literals intact)"""
+        return _COMMENT_RE.sub(
+            lambda m: m.group(0) if m.group(0).startswith('"') else '', code
+        )
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,3 @@
+"""
+Prompting strategies for Pony code synthesis
+"""
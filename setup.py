@@ -1,8 +1,20 @@
+import hashlib
+import json
+import shutil
 import subprocess
 import sys
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Remembers `ponyc --version` between runs, keyed by PATH and the binary's mtime
+PONYC_CACHE_DIR = Path.home() / '.cache' / 'pony_eval'
+
 class SetupChecker:
     def __init__(self):
         self.errors = []
@@ -20,6 +32,19 @@ class SetupChecker:
     def check_ponyc(self):
         """Check if ponyc compiler is installed"""
         print("Checking Pony compiler...", end=" ")
+        ponyc = shutil.which("ponyc")
+        if ponyc is None:
+            self.errors.append("ponyc not found")
+            return
+        
+        key = hashlib.sha1(
+            (os.environ.get('PATH', '') + ponyc + str(os.path.getmtime(ponyc))).encode()
+        ).hexdigest()
+        cache_file = PONYC_CACHE_DIR / f"ponyc_version_{key}"
+        if cache_file.exists():
+            print(f"({cache_file.read_text()})")
+            return
+        
         try:
             result = subprocess.run(
                 ["ponyc", "--version"],
@@ -30,6 +55,11 @@ class SetupChecker:
             if result.returncode == 0:
                 version = result.stdout.strip()
                 print(f"({version})")
+                try:
+                    PONYC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                    cache_file.write_text(version)
+                except OSError:
+                    pass  # caching is best-effort
             else:
                 self.errors.append("ponyc found but not working properly")
         except FileNotFoundError:
@@ -40,19 +70,24 @@ class SetupChecker:
     def check_python_packages(self):
         print("Checking Python packages...", end=" ")
         
-        required_packages = [
-            'google-generativeai',
-            'pandas',
-            'matplotlib',
-            'seaborn',
-            'numpy'
-        ]
+        # pip name -> import name
+        required_packages = {
+            'google-generativeai': 'google.generativeai',
+            'pandas': 'pandas',
+            'matplotlib': 'matplotlib',
+            'seaborn': 'seaborn',
+            'numpy': 'numpy'
+        }
         
+        # Only locate the packages; importing pandas/matplotlib/seaborn would
+        # run their (slow) top-level code just to check they exist
         missing = []
-        for package in required_packages:
+        for package, module in required_packages.items():
             try:
-                __import__(package.replace('-', '_'))
+                found = find_spec(module) is not None
             except ImportError:
+                found = False  # parent package (e.g. google) missing
+            if not found:
                 missing.append(package)
         
         if missing:
@@ -100,11 +135,10 @@ class SetupChecker:
             return
         
         try:
-            import json
-            with open(dataset_path, 'r') as f:
-                data = json.load(f)
-                task_count = len(data.get('tasks', []))
-                print(f"({task_count} tasks)")
+            raw = dataset_path.read_bytes()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            task_count = len(data.get('tasks', []))
+            print(f"({task_count} tasks)")
         except Exception as e:
             self.errors.append(f"Invalid dataset JSON: {e}")
 
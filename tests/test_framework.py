@@ -1,19 +1,88 @@
 #!/usr/bin/env python3
 """
 Unit tests for Pony LLM Evaluation Framework
+
+Run from the project root: python -m tests.test_framework
 """
 
 import unittest
 import json
+import os
+import re
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Add parent directories to path
-sys.path.append(str(Path(__file__).parent.parent / 'prompts'))
-sys.path.append(str(Path(__file__).parent.parent / 'evaluation'))
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    from unittest_parallel.main import main as parallel_main
+except ImportError:
+    parallel_main = None
+
+from prompts.prompting_strategies import get_prompt, ZERO_SHOT_TEMPLATE
+from evaluation.evaluator import extract_code_from_response, PonyCompiler
+from evaluation.analyze_results import analyze_retries
+from evaluation.utils import (
+    extract_error_type, analyze_pony_code, filter_tasks_by_criteria, TaskIndex, CodeFormatter
+)
+
+# Dataset parsed once per process and shared by every test that reads it
+_DATASET_PATH = Path(__file__).parent.parent / 'dataset' / 'pony_tasks.json'
+_DATASET = (orjson.loads if orjson is not None else json.loads)(_DATASET_PATH.read_bytes())
+_TASKS = _DATASET.get('tasks', [])
+
+_REQUIRED_FIELDS = frozenset({
+    'id', 'category', 'difficulty', 'title',
+    'description', 'prompt', 'reference_solution'
+})
+_VALID_CATEGORIES = frozenset({
+    'basic_syntax', 'reference_capabilities', 'actor_concurrency', 'complex_systems'
+})
+_VALID_DIFFICULTIES = frozenset({'easy', 'medium', 'hard', 'expert'})
+# Checked once at import so TestPonyCompiler is skipped without any setup
+_HAS_PONYC = shutil.which('ponyc') is not None
+
+# Compile work dirs go on tmpfs when available
+_TMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else None
+_PONY_KEYWORD_RE = re.compile(r'\b(?:actor|class|primitive|fun|be|new|let|var)\b')
+# Case-insensitive search without lowercasing a copy of the prompt
+_STEP_BY_STEP_RE = re.compile(r'step-by-step', re.IGNORECASE)
+
+# The per-task dataset checks below as one JSON schema
+_TASK_FIELD_SCHEMA = {'type': 'string', 'minLength': 1}
+_DATASET_SCHEMA = {
+    'type': 'object',
+    'required': ['metadata', 'tasks'],
+    'properties': {
+        'metadata': {'type': 'object', 'required': ['version', 'language']},
+        'tasks': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'required': sorted(_REQUIRED_FIELDS),
+                'properties': {
+                    **{field: _TASK_FIELD_SCHEMA for field in _REQUIRED_FIELDS},
+                    'category': {'enum': sorted(_VALID_CATEGORIES)},
+                    'difficulty': {'enum': sorted(_VALID_DIFFICULTIES)},
+                    'reference_solution': {**_TASK_FIELD_SCHEMA, 'pattern': _PONY_KEYWORD_RE.pattern},
+                },
+            },
+        },
+    },
+}
 
-from prompting_strategies import get_prompt, ZERO_SHOT_TEMPLATE
-from evaluator import extract_code_from_response, PonyCompiler
 
 class TestPromptGeneration(unittest.TestCase):
     """Test prompt generation for different strategies"""
@@ -41,7 +110,7 @@ class TestPromptGeneration(unittest.TestCase):
         task_desc = "Create an isolated counter"
         prompt = get_prompt('chain_of_thought', task_desc)
         
-        self.assertIn("step-by-step", prompt.lower())
+        self.assertIsNotNone(_STEP_BY_STEP_RE.search(prompt))
         self.assertIn("REASONING", prompt)
         self.assertIn("CODE", prompt)
     
@@ -54,11 +123,12 @@ class TestPromptGeneration(unittest.TestCase):
         ]
         
         task_desc = "Test task"
+        bad = []
         for strategy in strategies:
-            with self.subTest(strategy=strategy):
-                prompt = get_prompt(strategy, task_desc)
-                self.assertIsInstance(prompt, str)
-                self.assertGreater(len(prompt), 0)
+            prompt = get_prompt(strategy, task_desc)
+            if not isinstance(prompt, str) or not prompt:
+                bad.append(strategy)
+        self.assertFalse(bad, f"Strategies without a non-empty prompt string: {bad}")
 
 class TestCodeExtraction(unittest.TestCase):
     """Test code extraction from LLM responses"""
@@ -114,15 +184,19 @@ actor Main
         code = extract_code_from_response(response)
         self.assertEqual(code, response.strip())
 
+    def test_no_code_blocks_skips_leading_prose(self):
+        """Test unfenced code starts at the first Pony declaration"""
+        response = "A function-free solution follows:\nactor Main\n  new create(env: Env) =>\n    None"
+        code = extract_code_from_response(response)
+        self.assertTrue(code.startswith("actor Main"))
+
 class TestDatasetValidation(unittest.TestCase):
     """Test dataset structure and validity"""
     
     @classmethod
     def setUpClass(cls):
-        """Load dataset once for all tests"""
-        dataset_path = Path(__file__).parent.parent / 'dataset' / 'pony_tasks.json'
-        with open(dataset_path, 'r') as f:
-            cls.dataset = json.load(f)
+        """Share the module-level dataset with all tests"""
+        cls.dataset = _DATASET
     
     def test_dataset_has_metadata(self):
         """Test dataset has required metadata"""
@@ -136,108 +210,204 @@ class TestDatasetValidation(unittest.TestCase):
         self.assertIsInstance(self.dataset['tasks'], list)
         self.assertGreater(len(self.dataset['tasks']), 0)
     
+    def test_dataset_schema(self):
+        """Test the whole dataset against the JSON schema in one validator call"""
+        if fastjsonschema is None:
+            self.skipTest("fastjsonschema not installed")
+        validate = fastjsonschema.compile(_DATASET_SCHEMA)
+        try:
+            validate(self.dataset)
+        except fastjsonschema.JsonSchemaValueException as e:
+            self.fail(f"Dataset does not match schema at {e.name}: {e.message}")
+    
     def test_all_tasks_have_required_fields(self):
         """Test all tasks have required fields"""
-        required_fields = [
-            'id', 'category', 'difficulty', 'title',
-            'description', 'prompt', 'reference_solution'
-        ]
-        
-        for task in self.dataset['tasks']:
-            with self.subTest(task_id=task.get('id', 'unknown')):
-                for field in required_fields:
-                    self.assertIn(field, task)
-                    self.assertIsInstance(task[field], str)
-                    self.assertGreater(len(task[field]), 0)
+        missing, empty = {}, {}
+        for task in _TASKS:
+            task_id = task.get('id', 'unknown')
+            absent = _REQUIRED_FIELDS.difference(task)
+            blank = [
+                field for field in _REQUIRED_FIELDS - absent
+                if not isinstance(task[field], str) or not task[field]
+            ]
+            if absent:
+                missing[task_id] = sorted(absent)
+            if blank:
+                empty[task_id] = sorted(blank)
+        self.assertFalse(missing, f"Tasks with missing fields: {missing}")
+        self.assertFalse(empty, f"Tasks with empty or non-string fields: {empty}")
     
     def test_task_categories_valid(self):
         """Test task categories are valid"""
-        valid_categories = [
-            'basic_syntax',
-            'reference_capabilities',
-            'actor_concurrency',
-            'complex_systems'
-        ]
-        
-        for task in self.dataset['tasks']:
-            with self.subTest(task_id=task['id']):
-                self.assertIn(task['category'], valid_categories)
+        invalid = [t['id'] for t in _TASKS if t['category'] not in _VALID_CATEGORIES]
+        self.assertFalse(invalid, f"Tasks with an invalid category: {invalid}")
     
     def test_task_difficulties_valid(self):
         """Test task difficulties are valid"""
-        valid_difficulties = ['easy', 'medium', 'hard', 'expert']
-        
-        for task in self.dataset['tasks']:
-            with self.subTest(task_id=task['id']):
-                self.assertIn(task['difficulty'], valid_difficulties)
+        invalid = [t['id'] for t in _TASKS if t['difficulty'] not in _VALID_DIFFICULTIES]
+        self.assertFalse(invalid, f"Tasks with an invalid difficulty: {invalid}")
     
     def test_reference_solutions_are_valid_pony(self):
         """Test reference solutions contain Pony keywords"""
-        pony_keywords = ['actor', 'class', 'primitive', 'fun', 'be', 'new', 'let', 'var']
+        # At least one Pony keyword should be present (one regex scan)
+        no_keywords = [
+            t['id'] for t in _TASKS
+            if _PONY_KEYWORD_RE.search(t['reference_solution']) is None
+        ]
+        self.assertFalse(no_keywords, f"Reference solutions without Pony keywords: {no_keywords}")
+
+class TestRetryAnalysis(unittest.TestCase):
+    """Test retry statistics aggregation"""
+    
+    def test_retry_aggregates(self):
+        """Test running totals produce the expected means and max"""
+        results = [
+            {'strategy': 'zero_shot', 'compilation_success': True, 'retry_count': 0},
+            {'strategy': 'zero_shot', 'compilation_success': True, 'retry_count': 3},
+            {'strategy': 'few_shot', 'compilation_success': True, 'retry_count': 1},
+            {'strategy': 'few_shot', 'compilation_success': False, 'retry_count': 4},
+        ]
+        stats = analyze_retries(results)
         
-        for task in self.dataset['tasks']:
-            solution = task['reference_solution']
-            with self.subTest(task_id=task['id']):
-                # At least one Pony keyword should be present
-                has_keyword = any(keyword in solution for keyword in pony_keywords)
-                self.assertTrue(has_keyword, 
-                    f"Reference solution should contain Pony keywords")
+        self.assertEqual(stats['succeeded_on_first_try'], 1)
+        self.assertEqual(stats['succeeded_on_retry'], 2)
+        self.assertEqual(stats['never_succeeded'], 1)
+        self.assertEqual(stats['mean_retries_when_needed'], 2.0)
+        self.assertEqual(stats['max_retries_needed'], 3)
+        self.assertEqual(stats['by_strategy']['zero_shot']['total_retries'], 3)
+        self.assertEqual(stats['final_success_rate'], 75.0)
+    
+    def test_no_retries(self):
+        """Test stats when nothing needed a retry"""
+        stats = analyze_retries([])
+        self.assertEqual(stats['mean_retries_when_needed'], 0)
+        self.assertEqual(stats['max_retries_needed'], 0)
 
+class TestCodeUtils(unittest.TestCase):
+    """Test evaluation/utils.py helpers"""
+    
+    def test_error_type_priority(self):
+        """Test categories are chosen by priority, not position in the message"""
+        self.assertEqual(extract_error_type("undefined foo\nsyntax error"), "syntax")
+        self.assertEqual(extract_error_type("Error: can't find declaration of 'x'"), "reference")
+        self.assertEqual(extract_error_type("expected U32\ngot String"), "other")
+        self.assertEqual(extract_error_type(""), "unknown")
+    
+    def test_analyze_pony_code(self):
+        """Test the single-pass feature scan"""
+        code = """actor Main
+  new create(env: Env) =>
+    let c = Counter
+    c.increment()
+
+actor Counter
+  var _count: U64 = 0
+  be increment() =>
+    _count = recover val _count + 1 end
+  be report(out: OutStream tag) =>
+    out.print(_count.string())"""
+        analysis = analyze_pony_code(code)
+        
+        self.assertEqual(sorted(analysis['capabilities_used']), ['tag', 'val'])
+        self.assertEqual(analysis['num_actors'], 2)
+        self.assertEqual(analysis['num_behaviors'], 2)
+        self.assertTrue(analysis['uses_recover'])
+        self.assertEqual(analysis['num_lines'], 11)
+        self.assertTrue(analysis['has_main'])
+    
+    def test_remove_comments_keeps_strings(self):
+        """Test comment markers inside string literals are not stripped"""
+        code = 'env.out.print("http://x /* y */") // greet\n/* block\ncomment */let a = 1'
+        self.assertEqual(
+            CodeFormatter.remove_comments(code),
+            'env.out.print("http://x /* y */") \nlet a = 1'
+        )
+    
+    def test_task_index_matches_filter(self):
+        """Test TaskIndex returns the same tasks, in order, as a linear filter"""
+        tasks = [
+            {'id': 'basic_003', 'category': 'basic_syntax', 'difficulty': 'easy'},
+            {'id': 'actor_001', 'category': 'actor_concurrency', 'difficulty': 'hard'},
+            {'id': 'basic_001', 'category': 'basic_syntax', 'difficulty': 'medium'},
+            {'id': 'basic_002', 'category': 'basic_syntax', 'difficulty': 'easy'},
+        ]
+        index = TaskIndex(tasks)
+        queries = [
+            {},
+            {'category': 'basic_syntax', 'difficulty': 'easy'},
+            {'min_id': 2},
+            {'category': 'basic_syntax', 'max_id': 2},
+            {'difficulty': 'expert'},
+        ]
+        for query in queries:
+            self.assertEqual(index.filter(**query), filter_tasks_by_criteria(tasks, **query))
+        self.assertEqual([t['id'] for t in index.filter(min_id=2)], ['basic_003', 'basic_002'])
+
+@unittest.skipUnless(_HAS_PONYC, "ponyc not installed")
 class TestPonyCompiler(unittest.TestCase):
     """Test Pony compiler integration"""
     
-    def setUp(self):
-        """Set up test environment"""
-        try:
-            self.compiler = PonyCompiler()
-            self.has_ponyc = True
-        except RuntimeError:
-            self.has_ponyc = False
+    @classmethod
+    def setUpClass(cls):
+        """Set up one compiler shared by every test in the class"""
+        cls.compiler = PonyCompiler()
     
     def test_compiler_available(self):
         """Test that ponyc is available"""
-        if not self.has_ponyc:
-            self.skipTest("ponyc not installed")
-        
         self.assertIsNotNone(self.compiler)
     
-    def test_compile_valid_code(self):
-        """Test compiling valid Pony code"""
-        if not self.has_ponyc:
-            self.skipTest("ponyc not installed")
-        
-        code = """
+    def test_compile_valid_and_invalid_code(self):
+        """Test compiling valid and invalid Pony code (both ponyc runs at once)"""
+        valid_code = """
 actor Main
   new create(env: Env) =>
     env.out.print("Hello World")
 """
-        work_dir = Path('/tmp/pony_test_valid')
-        work_dir.mkdir(exist_ok=True)
-        
-        success, error = self.compiler.compile_code(code, work_dir)
-        self.assertTrue(success, f"Valid code should compile: {error}")
-    
-    def test_compile_invalid_code(self):
-        """Test compiling invalid Pony code"""
-        if not self.has_ponyc:
-            self.skipTest("ponyc not installed")
-        
-        code = """
+        invalid_code = """
 actor Main
   this is not valid pony code!!!
 """
-        work_dir = Path('/tmp/pony_test_invalid')
-        work_dir.mkdir(exist_ok=True)
         
-        success, error = self.compiler.compile_code(code, work_dir)
-        self.assertFalse(success, "Invalid code should not compile")
-        self.assertIsNotNone(error)
+        def compile_in_temp_dir(code):
+            with tempfile.TemporaryDirectory(dir=_TMP_ROOT) as work_dir:
+                return self.compiler.compile_code(code, Path(work_dir))
+        
+        # ponyc runs as a subprocess, so two threads compile in parallel
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            valid, invalid = executor.map(compile_in_temp_dir, [valid_code, invalid_code])
+        
+        with self.subTest(code='valid'):
+            success, error = valid
+            self.assertTrue(success, f"Valid code should compile: {error}")
+        with self.subTest(code='invalid'):
+            success, error = invalid
+            self.assertFalse(success, "Invalid code should not compile")
+            self.assertIsNotNone(error)
 
 def run_tests():
-    """Run all tests with verbose output"""
+    """
+    Run all tests, one dot per passing test
+    
+    Test output is buffered and only shown for failures. Uses
+    unittest-parallel when installed, spreading the test classes over one
+    worker process per core; otherwise runs the suite serially.
+    """
+    if parallel_main is not None:
+        this_file = Path(__file__).resolve()
+        try:
+            parallel_main([
+                '-b', '--level', 'class',
+                '-s', str(this_file.parent), '-p', this_file.name,
+                '-t', str(this_file.parent.parent)
+            ])
+        except SystemExit as exc:
+            # unittest-parallel exits with the failure count when tests fail
+            return not exc.code
+        return True
+    
     loader = unittest.TestLoader()
     suite = loader.loadTestsFromModule(sys.modules[__name__])
-    runner = unittest.TextTestRunner(verbosity=2)
+    runner = unittest.TextTestRunner(verbosity=1, buffer=True, stream=sys.stderr)
     result = runner.run(suite)
     return result.wasSuccessful()
 